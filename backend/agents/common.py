@@ -0,0 +1,37 @@
+import re
+import threading
+from typing import Optional
+
+# Compiled once: parsing critic responses runs on every critique.
+SCORE_LINE = re.compile(r"Score:\s*([\d\.]+)")
+FEEDBACK_LINE = re.compile(r"Feedback:\s*(.+)", re.DOTALL)
+JSON_OBJECT = re.compile(r"\{.*\}", re.DOTALL)
+
+
+class CriticCancelled(Exception):
+    """Raised inside a critic whose verdict is no longer needed."""
+
+
+def invoke_llm(llm, messages: list, cancel_event: Optional[threading.Event] = None) -> str:
+    """
+    Call the LLM and return the response text.
+
+    With a `cancel_event`, the response is streamed and abandoned as soon as the event
+    is set; closing the stream drops the HTTP connection, which stops generation on the
+    backend instead of paying for the rest of the completion.
+    """
+    if cancel_event is None:
+        return llm.invoke(messages).content
+
+    parts = []
+    stream = llm.stream(messages)
+    try:
+        for chunk in stream:
+            if cancel_event.is_set():
+                raise CriticCancelled()
+            parts.append(chunk.content)
+    finally:
+        stream.close()
+    if cancel_event.is_set():
+        raise CriticCancelled()
+    return "".join(parts)
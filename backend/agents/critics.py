@@ -0,0 +1,74 @@
+import contextvars
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from backend.state import ProtocolState
+from backend.agents.safety import evaluate_safety
+from backend.agents.empathy import evaluate_empathy
+from backend.agents.supervisor import verdict_is_final
+
+# When to stop waiting for the empathy critic in short-circuit mode:
+# - "decided":  as soon as the supervisor's decision no longer depends on the missing verdict
+# - "critical": only when safety reports a critical score (<= SAFETY_CRITICAL_SCORE)
+# - "never":    always wait for both critics (same results as the parallel fan-out)
+CRITIC_EARLY_EXIT = os.getenv("CRITIC_EARLY_EXIT", "decided")
+SAFETY_CRITICAL_SCORE = float(os.getenv("SAFETY_CRITICAL_SCORE", "0.0"))
+
+# Only the empathy verdict may be abandoned; the safety verdict always completes so the
+# drafter gets its feedback on every revision.
+CRITICS = {
+    "safety": (evaluate_safety, "safety_score"),
+    "empathy": (evaluate_empathy, "empathy_score"),
+}
+CANCELLABLE = ("empathy",)
+
+
+def should_exit_early(state: dict, pending: list[str]) -> bool:
+    if CRITIC_EARLY_EXIT == "never" or not pending:
+        return False
+    if any(name not in CANCELLABLE for name in pending):
+        return False
+    if CRITIC_EARLY_EXIT == "critical":
+        return state.get("safety_score", 1.0) <= SAFETY_CRITICAL_SCORE
+    return verdict_is_final(state, [CRITICS[name][1] for name in pending])
+
+
+def review_critics(state: ProtocolState) -> dict:
+    """
+    Short-circuit critic node: runs safety and empathy concurrently and cancels the
+    in-flight empathy call once the early-exit policy says its verdict cannot matter
+    (e.g. safety already forces a revision). Returns the same update as the fan-out.
+    """
+    current_draft = state.get("current_draft", "")
+    cancel_event = threading.Event()
+    pool = ThreadPoolExecutor(max_workers=len(CRITICS), thread_name_prefix="critic")
+
+    # Copy the context per task so LangGraph callbacks (token streaming) follow the calls.
+    futures = {
+        pool.submit(contextvars.copy_context().run, evaluate, current_draft, cancel_event): name
+        for name, (evaluate, _) in CRITICS.items()
+    }
+    pool.shutdown(wait=False)
+
+    merged = dict(state)
+    updates = {"feedback_from_agents": {}, "unscored": []}
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            result = future.result()
+            updates["feedback_from_agents"].update(result.pop("feedback_from_agents", {}))
+            updates.update(result)
+            merged.update(result)
+
+        pending_names = [futures[f] for f in pending]
+        if should_exit_early(merged, pending_names):
+            print(f"--- [Critics] Early exit, cancelling {pending_names} ---", file=sys.stderr)
+            cancel_event.set()
+            # Their scores keep the previous round's value; the supervisor must not log them as measured
+            updates["unscored"] = [CRITICS[name][1] for name in pending_names]
+            break
+
+    return updates
@@ -1,11 +1,26 @@
+import sys
+from typing import Optional
+
+from langchain_core.messages import SystemMessage, HumanMessage
+
+from backend.config import get_llm
 from backend.state import ProtocolState
+from backend.drafts import draft_store
+from backend.agents.revision import DRAFT_REVISION_MODE, revise_draft
+
+DRAFTER_INSTRUCTIONS = (
+    "You are an expert CBT (Cognitive Behavioral Therapy) Protocol Designer.\n"
+    "Your task is to create specific, actionable therapeutic exercises.\n"
+    "Output clear, structured steps for the user to follow."
+)
 
 def draft_protocol(state: ProtocolState) -> dict:
     """
     Drafting agent that generates or refines a CBT protocol.
     
-    It moves the current draft to previous_drafts, increments the iteration count,
-    and generates a new draft based on the user intent and any feedback.
+    It moves the current draft to previous_drafts (as a draft store reference), increments the iteration count,
+    and generates a new draft based on the user intent and any feedback. With DRAFT_REVISION_MODE=incremental,
+    a draft sent back by the critics is edited section by section instead of regenerated.
     """
     
     # 1. Archive current draft if it exists
@@ -19,20 +34,40 @@ def draft_protocol(state: ProtocolState) -> dict:
     iteration = state.get("iteration_count", 0)
     
     # 3. Generate Content
-    from backend.config import get_llm
-    from langchain_core.messages import SystemMessage, HumanMessage
+    draft_content = None
+    if DRAFT_REVISION_MODE == "incremental" and current_draft:
+        draft_content = revise_draft(current_draft, user_intent, feedback, state)
+    if draft_content is None:
+        draft_content = generate_draft(user_intent, feedback, iteration)
     
-    llm = get_llm()
+    updates = {
+        "user_intent": user_intent,
+        "current_draft": draft_content,
+        "iteration_count": iteration + 1,
+        "status": "reviewing",
+        # Clear feedback for new round
+        "feedback_from_agents": {"__RESET__": True} 
+    }
+
+    if current_draft:
+        # Stored as a delta against the draft it was revised from, when that is smaller
+        previous = state.get("previous_drafts") or []
+        updates["previous_drafts"] = [draft_store.put(current_draft, base=previous[-1] if previous else None)]
+    
+    return updates
+
+def generate_draft(user_intent: str, feedback: dict, iteration: int,
+                   temperature: Optional[float] = None, variant: Optional[str] = None) -> str:
+    """
+    Generate the text of draft #iteration+1.
+
+    `temperature` and `variant` (an extra instruction appended to the prompt) are used by
+    speculative drafting to make candidates differ; by default the drafter's settings apply.
+    """
+    llm = get_llm("drafter")
     
     if llm:
-        import sys
         print(f"--- [Drafter] Generating draft #{iteration + 1} using {llm.__class__.__name__} ---", file=sys.stderr)
-        system_instructions = (
-            "You are an expert CBT (Cognitive Behavioral Therapy) Protocol Designer.\n"
-            "Your task is to create specific, actionable therapeutic exercises.\n"
-            "Output clear, structured steps for the user to follow."
-        )
-        
         user_prompt = (
             f"User Intent: {user_intent}\n"
             f"Current Iteration: {iteration + 1}\n"
@@ -40,37 +75,29 @@ def draft_protocol(state: ProtocolState) -> dict:
         
         if feedback:
             user_prompt += f"\nCRITICAL FEEDBACK TO ADDRESS:\n{list(feedback.values())}"
+
+        if variant:
+            user_prompt += f"\n{variant}"
+
+        # Per-call temperature on a copy that shares the client (and its connection pool)
+        if temperature is not None and "temperature" in type(llm).model_fields:
+            llm = llm.model_copy(update={"temperature": temperature})
             
         try:
             response = llm.invoke([
-                SystemMessage(content=system_instructions),
+                SystemMessage(content=DRAFTER_INSTRUCTIONS),
                 HumanMessage(content=user_prompt)
             ])
-            draft_content = response.content
+            return response.content
         except Exception as e:
-            draft_content = f"Error generating content with LLM: {str(e)}"
+            return f"Error generating content with LLM: {str(e)}"
             
-    else:
-        # Fallback Mock logic
-        draft_content = (
-            f"Draft #{iteration + 1} for intent: '{user_intent}'.\n"
-            f"Addressing feedback: {list(feedback.values()) if feedback else 'None'}."
-            "\n\n[CBT Exercise Content Placeholder]\n"
-            "- Step 1: Identification\n"
-            "- Step 2: Challenge\n"
-            "- Step 3: Reframing"
-        )
-    
-    updates = {
-        "user_intent": user_intent,
-        "current_draft": draft_content,
-        "iteration_count": iteration + 1,
-        "status": "reviewing",
-        # Clear feedback for new round
-        "feedback_from_agents": {"__RESET__": True} 
-    }
-
-    if current_draft:
-        updates["previous_drafts"] = [current_draft]
-    
-    return updates
+    # Fallback Mock logic
+    return (
+        f"Draft #{iteration + 1} for intent: '{user_intent}'.\n"
+        f"Addressing feedback: {list(feedback.values()) if feedback else 'None'}."
+        "\n\n[CBT Exercise Content Placeholder]\n"
+        "- Step 1: Identification\n"
+        "- Step 2: Challenge\n"
+        "- Step 3: Reframing"
+    )
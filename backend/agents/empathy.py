@@ -1,15 +1,34 @@
 from backend.state import ProtocolState
 from backend.config import get_llm
+from backend.cache import critique_cache, llm_identity
+from backend.agents.common import CriticCancelled, invoke_llm, SCORE_LINE, FEEDBACK_LINE
 from langchain_core.messages import SystemMessage, HumanMessage
-import re
+import sys
+import threading
+from typing import Optional
+
+EMPATHY_PROMPT = (
+    "You are an empathetic clinical supervisor. "
+    "Evaluate the following CBT protocol draft for warmth, validation, and supportive tone.\n"
+    "Output ONLY a JSON-like string in this format:\n"
+    "Score: <number between 1.0 and 5.0>\n"
+    "Feedback: <one sentence critique>\n\n"
+    "Draft:\n{draft}"
+)
 
 def critique_empathy(state: ProtocolState) -> dict:
     """
     Empathy Agent that reviews the current draft for empathetic tone using an LLM.
     Returns partial update merging into feedback.
     """
-    current_draft = state.get("current_draft", "")
-    llm = get_llm()
+    return evaluate_empathy(state.get("current_draft", ""))
+
+def evaluate_empathy(current_draft: str, cancel_event: Optional[threading.Event] = None) -> dict:
+    """
+    Score a draft and return the empathy state update.
+    Raises CriticCancelled if `cancel_event` is set before the LLM finishes.
+    """
+    llm = get_llm("empathy")
     
     if not llm:
         # Fallback if no LLM configured
@@ -18,34 +37,39 @@ def critique_empathy(state: ProtocolState) -> dict:
             "feedback_from_agents": {"empathy": "LLM not available for critique. Defaulting to neutral."}
         }
 
-    prompt = (
-        "You are an empathetic clinical supervisor. "
-        "Evaluate the following CBT protocol draft for warmth, validation, and supportive tone.\n"
-        "Output ONLY a JSON-like string in this format:\n"
-        "Score: <number between 1.0 and 5.0>\n"
-        "Feedback: <one sentence critique>\n\n"
-        f"Draft:\n{current_draft}"
-    )
+    # Identical draft + prompt + model -> reuse the previous verdict
+    cache_key = critique_cache.key(EMPATHY_PROMPT, llm_identity(llm), current_draft)
+    cached = critique_cache.get(cache_key)
+    if cached:
+        return {
+            "empathy_score": cached["score"],
+            "feedback_from_agents": {"empathy": cached["feedback"]}
+        }
+
+    prompt = EMPATHY_PROMPT.format(draft=current_draft)
     
     try:
-        response = llm.invoke([HumanMessage(content=prompt)]).content
+        response = invoke_llm(llm, [HumanMessage(content=prompt)], cancel_event)
         
         # Parse Score
-        score_match = re.search(r"Score:\s*([\d\.]+)", response)
+        score_match = SCORE_LINE.search(response)
         score = float(score_match.group(1)) if score_match else 3.0
         
         # Parse Feedback
-        feedback_match = re.search(r"Feedback:\s*(.+)", response, re.DOTALL)
+        feedback_match = FEEDBACK_LINE.search(response)
         notes = feedback_match.group(1).strip() if feedback_match else response
         
         # Cap score just in case
         score = max(1.0, min(5.0, score))
         
+    except CriticCancelled:
+        raise
     except Exception as e:
-        import sys
         print(f"Empathy Agent Error: {e}", file=sys.stderr)
         score = 3.0
         notes = "Error during empathy evaluation."
+    else:
+        critique_cache.set(cache_key, {"score": score, "feedback": notes})
 
     return {
         "empathy_score": score,
@@ -0,0 +1,94 @@
+from backend.state import ProtocolState
+from backend.config import get_llm
+from backend.cache import critique_cache, llm_identity
+from backend.agents.common import invoke_llm, JSON_OBJECT
+from backend.agents.prescreen import screen
+from langchain_core.messages import HumanMessage
+import json
+import sys
+
+FUSED_PROMPT = (
+    "You are a clinical supervisor reviewing a CBT protocol draft on two axes.\n"
+    "1. Safety: any risk of self-harm, medical advice, or dangerous instructions.\n"
+    "   Score 1.0 for Safe, 0.5 for Warning, 0.0 for Critical.\n"
+    "2. Empathy: warmth, validation, and supportive tone.\n"
+    "   Score a number between 1.0 and 5.0.\n"
+    "Output ONLY a JSON object in this format:\n"
+    '{{"safety_score": <number>, "safety_feedback": "<one sentence safety assessment>", '
+    '"empathy_score": <number>, "empathy_feedback": "<one sentence critique>"}}\n\n'
+    "Draft:\n{draft}"
+)
+
+def parse_fused(response: str) -> dict:
+    """Parse the fused verdict, tolerating prose around the JSON object."""
+    match = JSON_OBJECT.search(response)
+    verdict = json.loads(match.group(0)) if match else {}
+
+    safety = float(verdict.get("safety_score", 1.0))
+    empathy = max(1.0, min(5.0, float(verdict.get("empathy_score", 3.0))))
+    return {
+        "safety_score": safety,
+        "empathy_score": empathy,
+        "feedback_from_agents": {
+            "safety": verdict.get("safety_feedback") or response,
+            "empathy": verdict.get("empathy_feedback") or response
+        }
+    }
+
+def critique_fused(state: ProtocolState) -> dict:
+    """
+    Fused critic that scores safety and empathy in a single LLM request, so the draft
+    is sent (and prefilled) once per iteration. Returns the same update as the
+    separate safety and empathy nodes combined.
+    """
+    return {"unscored": [], **evaluate_fused(state.get("current_draft", ""))}
+
+def evaluate_fused(current_draft: str) -> dict:
+    """Score a draft on both axes and return the combined safety/empathy state update."""
+    # A red-flag draft is revised whatever its empathy score, so the LLM call can be skipped.
+    # (A clean pre-screen still needs the empathy score, so it does not help here.)
+    # The previous empathy score is kept and marked unscored, as in short-circuit mode.
+    screening = screen(current_draft)
+    if screening.decided and screening.score == 0.0:
+        return {
+            "safety_score": 0.0,
+            "unscored": ["empathy_score"],
+            "feedback_from_agents": {
+                "safety": screening.feedback,
+                "empathy": "Not evaluated: the draft failed the safety pre-screen."
+            }
+        }
+
+    llm = get_llm("critic")
+
+    if not llm:
+        return {
+            "safety_score": 1.0,
+            "empathy_score": 3.0,
+            "feedback_from_agents": {
+                "safety": "LLM not available. Assuming safe.",
+                "empathy": "LLM not available for critique. Defaulting to neutral."
+            }
+        }
+
+    cache_key = critique_cache.key(FUSED_PROMPT, llm_identity(llm), current_draft)
+    cached = critique_cache.get(cache_key)
+    if cached:
+        return cached
+
+    try:
+        response = invoke_llm(llm, [HumanMessage(content=FUSED_PROMPT.format(draft=current_draft))])
+        update = parse_fused(response)
+    except Exception as e:
+        print(f"Fused Critic Error: {e}", file=sys.stderr)
+        return {
+            "safety_score": 0.5,
+            "empathy_score": 3.0,
+            "feedback_from_agents": {
+                "safety": "Error during safety evaluation.",
+                "empathy": "Error during empathy evaluation."
+            }
+        }
+
+    critique_cache.set(cache_key, update)
+    return update
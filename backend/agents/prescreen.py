@@ -0,0 +1,189 @@
+import json
+import os
+import re
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+
+from backend.metrics import safety_prescreen
+
+# Which drafts the rule-based pre-screen may decide without the LLM safety critic:
+# - "clear":    red-flag drafts (score 0.0) and confidently clean drafts (score 1.0)
+# - "critical": only red-flag drafts; everything else still goes to the LLM
+# - "off":      always ask the LLM
+SAFETY_PRESCREEN = os.getenv("SAFETY_PRESCREEN", "clear")
+# Confidence a clean verdict needs before the LLM is skipped (see `screen`).
+SAFETY_PRESCREEN_MIN_CONFIDENCE = float(os.getenv("SAFETY_PRESCREEN_MIN_CONFIDENCE", "0.9"))
+# Optional JSON file {"critical": [...], "warning": [...], "protective": [...]} extending the lexicon.
+SAFETY_LEXICON_PATH = os.getenv("SAFETY_LEXICON_PATH", "")
+
+# critical:   instructions that make a protocol unsafe outright, unless the same sentence frames
+#             them protectively ("if you feel you might hurt yourself, call emergency services")
+# warning:    topics that need judgement (medication, substances, risk language) -> ask the LLM
+# protective: safety framing a clean protocol is expected to contain
+DEFAULT_LEXICON = {
+    "critical": [
+        "kill yourself", "end your life", "hurt yourself", "harm yourself", "cut yourself",
+        "starve yourself", "stop eating", "stop taking your medication", "stop your medication",
+        "skip your medication", "double your dose", "take extra pills",
+        "don't tell anyone", "do not tell anyone", "without telling anyone", "hide it from",
+        "punish yourself", "you deserve to suffer",
+    ],
+    "warning": [
+        "suicide", "suicidal", "self-harm", "self harm", "overdose", "medication", "dosage", "dose", "mg",
+        "prescription", "antidepressant", "benzodiazepine", "alcohol", "drink to", "drugs",
+        "diagnose", "diagnosis", "fasting", "purging", "flooding", "trauma", "abuse",
+        "as long as it takes", "force yourself", "no matter how",
+    ],
+    "protective": [
+        "therapist", "mental health professional", "healthcare provider", "doctor", "gp",
+        "crisis line", "emergency services", "helpline", "seek help", "reach out",
+        "at your own pace", "you can stop", "take a break", "if it feels too much", "if you feel unsafe",
+    ],
+}
+
+MIN_WORDS = 30
+MAX_WORDS = 3000
+
+_STEP = re.compile(r"^\s*(?:\d+[.):]|[-*•]|step\s+\d+)", re.IGNORECASE | re.MULTILINE)
+_URL = re.compile(r"https?://|www\.", re.IGNORECASE)
+_SPACES = re.compile(r"\s+")
+_SENTENCE_END = re.compile(r"[.!?\n]")
+
+
+class AhoCorasick:
+    """Multi-pattern matcher: finds every lexicon phrase in one pass over the text."""
+
+    def __init__(self, patterns: dict[str, str]):
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[list[tuple[str, str]]] = [[]]
+        for pattern, category in patterns.items():
+            self._insert(pattern, category)
+        self._link()
+
+    def _insert(self, pattern: str, category: str):
+        node = 0
+        for char in pattern:
+            if char not in self._goto[node]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._goto[node][char] = len(self._goto) - 1
+            node = self._goto[node][char]
+        self._out[node].append((pattern, category))
+
+    def _link(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def find(self, text: str) -> Iterator[tuple[int, str, str]]:
+        """Yield (start, pattern, category) for every occurrence, overlapping ones included."""
+        node = 0
+        for i, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for pattern, category in self._out[node]:
+                yield i - len(pattern) + 1, pattern, category
+
+
+def load_lexicon(path: str = SAFETY_LEXICON_PATH) -> dict[str, str]:
+    """Phrase -> category, defaults extended by SAFETY_LEXICON_PATH. Earlier categories win."""
+    lexicon = {category: list(phrases) for category, phrases in DEFAULT_LEXICON.items()}
+    if path:
+        with open(path, encoding="utf-8") as f:
+            for category, phrases in json.load(f).items():
+                lexicon.setdefault(category, []).extend(phrases)
+
+    patterns = {}
+    for category in ("critical", "warning", "protective"):
+        for phrase in lexicon.get(category, []):
+            patterns.setdefault(_SPACES.sub(" ", phrase.lower()).strip(), category)
+    return patterns
+
+
+_matcher = AhoCorasick(load_lexicon())
+
+
+@dataclass
+class Screening:
+    """Outcome of the pre-screen. `score` is None when the draft must go to the LLM."""
+    score: Optional[float]
+    confidence: float
+    feedback: str
+    matches: dict[str, list[str]] = field(default_factory=dict)
+
+    @property
+    def decided(self) -> bool:
+        return self.score is not None
+
+
+def _is_word(text: str, start: int, end: int) -> bool:
+    before = text[start - 1] if start > 0 else " "
+    after = text[end] if end < len(text) else " "
+    return not before.isalnum() and not after.isalnum()
+
+
+def _sentence(text: str, start: int, end: int) -> tuple[int, int]:
+    """Bounds of the sentence (or line) around text[start:end]."""
+    before = [m.end() for m in _SENTENCE_END.finditer(text, 0, start)]
+    after = _SENTENCE_END.search(text, end)
+    return (before[-1] if before else 0), (after.start() if after else len(text))
+
+
+def screen(draft: str, policy: str = SAFETY_PRESCREEN,
+           min_confidence: float = SAFETY_PRESCREEN_MIN_CONFIDENCE) -> Screening:
+    """
+    Classify a draft as red-flag, clean, or ambiguous (needs the LLM).
+
+    Any critical phrase decides the draft unsafe (0.0), except in a sentence that also has
+    protective framing: crisis guidance names what to watch for, so those go to the LLM. A draft with no critical or warning
+    phrase is clean with a confidence built from structural checks (numbered steps, sane
+    length, no links) and protective framing; it skips the LLM only at `min_confidence`.
+    """
+    if policy == "off" or not draft:
+        return Screening(None, 0.0, "Pre-screen skipped.")
+
+    # Whitespace runs collapse to one character, a line break where there was one; phrases
+    # are matched on the flat copy (same offsets), sentences are cut on the other.
+    text = _SPACES.sub(lambda m: "\n" if "\n" in m.group() else " ", draft.lower())
+    flat = text.replace("\n", " ")
+    found = [(start, pattern, category) for start, pattern, category in _matcher.find(flat)
+             if _is_word(flat, start, start + len(pattern))]
+    protective = [start for start, _, category in found if category == "protective"]
+
+    matches: dict[str, list[str]] = {}
+    for start, pattern, category in found:
+        if category == "critical":
+            low, high = _sentence(text, start, start + len(pattern))
+            if any(low <= p < high for p in protective):
+                category = "warning"
+        matches.setdefault(category, []).append(pattern)
+
+    if matches.get("critical"):
+        safety_prescreen.inc("critical")
+        phrases = ", ".join(sorted(set(matches["critical"])))
+        return Screening(0.0, 1.0, f"Contains unsafe instructions ({phrases}). Remove them and add safety guidance.", matches)
+
+    words = len(draft.split())
+    structured = len(_STEP.findall(draft)) >= 2
+    sane_length = MIN_WORDS <= words <= MAX_WORDS
+    confidence = round(0.5 + 0.2 * structured + 0.2 * bool(matches.get("protective")) + 0.1 * sane_length, 2)
+    if _URL.search(draft) or draft.startswith("Error generating content"):
+        confidence = 0.0  # links and failed generations always get a real review
+
+    if policy == "clear" and not matches.get("warning") and confidence >= min_confidence:
+        safety_prescreen.inc("clean")
+        return Screening(1.0, confidence, "Pre-screen: structured, includes safety guidance, no risk indicators.", matches)
+
+    safety_prescreen.inc("escalated")
+    return Screening(None, confidence, "Escalated to the safety critic.", matches)
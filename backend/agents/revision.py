@@ -0,0 +1,147 @@
+import json
+import os
+import re
+import sys
+from typing import Optional
+
+from langchain_core.messages import HumanMessage, SystemMessage
+from langgraph.constants import TAG_NOSTREAM
+
+from backend.config import get_llm
+from backend.agents.common import JSON_OBJECT
+
+# How the drafter revises a draft the critics sent back:
+# - "full":        regenerate the whole protocol from the intent and the feedback
+# - "incremental": send the current draft and the feedback, apply the section edits returned
+DRAFT_REVISION_MODE = os.getenv("DRAFT_REVISION_MODE", "full")
+
+REVISION_INSTRUCTIONS = (
+    "You are an expert CBT (Cognitive Behavioral Therapy) Protocol Editor.\n"
+    "You revise existing protocols with the smallest edits that address the reviewers' feedback."
+)
+
+REVISION_PROMPT = (
+    "Revise the CBT protocol below so that it addresses the reviewer feedback.\n"
+    "Change only what the feedback requires and leave every other section untouched.\n"
+    "Output ONLY a JSON object listing your edits:\n"
+    '{{"edits": [{{"section": "S2", "action": "replace", "text": "<new text of the section>"}}]}}\n'
+    'Actions: "replace" a section, "delete" it, or "insert_after" a section ("S0" inserts at the top).\n\n'
+    "User Intent: {user_intent}\n\n"
+    "Reviewer feedback:\n{feedback}\n\n"
+    "Current protocol, by section:\n{sections}"
+)
+
+ACTIONS = ("replace", "delete", "insert_after")
+
+_HEADING = re.compile(r"^(?:#{1,6}\s|\*\*[^*\n]+\*\*:?\s*$)", re.MULTILINE)
+_STEP = re.compile(r"^\s*(?:\d+[.):]\s|[-*•]\s|step\s+\d+)", re.IGNORECASE | re.MULTILINE)
+_PARAGRAPH = re.compile(r"\n\s*\n")
+_SECTION_ID = re.compile(r"^S(\d+)$", re.IGNORECASE)
+
+
+def split_sections(draft: str) -> list[list[str]]:
+    """
+    Split a draft into [content, separator] pairs at markdown headings, else at numbered
+    steps or bullets, else at blank lines. Joining every pair gives back the draft.
+    """
+    for pattern in (_HEADING, _STEP):
+        starts = [m.start() for m in pattern.finditer(draft)]
+        if len(starts) >= 2:
+            break
+    else:
+        starts = [m.end() for m in _PARAGRAPH.finditer(draft)]
+
+    bounds = sorted({0, *starts}) + [len(draft)]
+    sections = []
+    for start, end in zip(bounds, bounds[1:]):
+        chunk = draft[start:end]
+        content = chunk.rstrip()
+        if content:
+            sections.append([content, chunk[len(content):]])
+        elif sections:
+            sections[-1][1] += chunk
+    return sections
+
+
+def format_sections(sections: list[list[str]]) -> str:
+    return "\n\n".join(f"[S{i}]\n{content}" for i, (content, _) in enumerate(sections, 1))
+
+
+def format_feedback(feedback: dict, scores: dict) -> str:
+    """One line per critic, with its score when known."""
+    lines = []
+    for critic, text in feedback.items():
+        score = scores.get(f"{critic}_score")
+        lines.append(f"- {critic}" + (f" (score {score})" if score is not None else "") + f": {text}")
+    return "\n".join(lines)
+
+
+def parse_edits(response: str) -> list[dict]:
+    """Parse the edit list, tolerating prose or code fences around the JSON object."""
+    match = JSON_OBJECT.search(response)
+    try:
+        edits = json.loads(match.group(0)).get("edits", []) if match else []
+    except (ValueError, AttributeError):
+        return []
+    return [e for e in edits if isinstance(e, dict) and e.get("action") in ACTIONS]
+
+
+def apply_edits(sections: list[list[str]], edits: list[dict]) -> Optional[str]:
+    """Apply section edits and return the new draft, or None if no edit could be applied."""
+    contents = {i: content for i, (content, _) in enumerate(sections, 1)}
+    inserts: dict[int, list[str]] = {}
+    applied = 0
+    for edit in edits:
+        match = _SECTION_ID.match(str(edit.get("section", "")).strip())
+        index = int(match.group(1)) if match else -1
+        text = str(edit.get("text") or "").strip()
+        if edit["action"] == "insert_after" and 0 <= index <= len(sections) and text:
+            inserts.setdefault(index, []).append(text)
+        elif edit["action"] == "replace" and index in contents and text:
+            contents[index] = text
+        elif edit["action"] == "delete" and index in contents:
+            contents[index] = ""
+        else:
+            continue
+        applied += 1
+    if not applied:
+        return None
+
+    parts = [text + "\n\n" for text in inserts.get(0, [])]
+    for i, (_, separator) in enumerate(sections, 1):
+        if contents[i]:
+            parts.append(contents[i] + (separator or "\n\n"))
+        parts.extend(text + "\n\n" for text in inserts.get(i, []))
+    return "".join(parts).rstrip() + "\n" if parts else None
+
+
+def revise_draft(draft: str, user_intent: str, feedback: dict, scores: dict) -> Optional[str]:
+    """
+    Revise `draft` with targeted section edits. Returns None when the model's answer
+    cannot be applied, so the caller can regenerate the draft instead.
+    """
+    llm = get_llm("drafter")
+    if not llm or not draft or not feedback or draft.startswith("Error generating content"):
+        return None
+
+    sections = split_sections(draft)
+    prompt = REVISION_PROMPT.format(
+        user_intent=user_intent, feedback=format_feedback(feedback, scores), sections=format_sections(sections)
+    )
+    try:
+        # Not streamed as `token` events: the answer is an edit list, not draft text.
+        response = llm.invoke(
+            [SystemMessage(content=REVISION_INSTRUCTIONS), HumanMessage(content=prompt)],
+            config={"tags": [TAG_NOSTREAM]},
+        )
+    except Exception as e:
+        print(f"--- [Drafter] Revision failed ({e}), regenerating ---", file=sys.stderr)
+        return None
+
+    edits = parse_edits(response.content)
+    revised = apply_edits(sections, edits)
+    if revised is None:
+        print("--- [Drafter] No applicable edits, regenerating ---", file=sys.stderr)
+        return None
+    print(f"--- [Drafter] Applied {len(edits)} section edit(s) to {len(sections)} section(s) ---", file=sys.stderr)
+    return revised
@@ -1,47 +1,80 @@
 from backend.state import ProtocolState
 from backend.config import get_llm
+from backend.cache import critique_cache, llm_identity
+from backend.agents.common import CriticCancelled, invoke_llm, SCORE_LINE, FEEDBACK_LINE
+from backend.agents.prescreen import screen
 from langchain_core.messages import SystemMessage, HumanMessage
-import re
+import sys
+import threading
+from typing import Optional
+
+SAFETY_PROMPT = (
+    "You are a Clinical Safety Supervisor. "
+    "Review the following CBT protocol for any risk of self-harm, medical advice, or dangerous instructions.\n"
+    "Output ONLY a JSON-like string in this format:\n"
+    "Score: <1.0 for Safe, 0.5 for Warning, 0.0 for Critical>\n"
+    "Feedback: <one sentence safety assessment>\n\n"
+    "Draft:\n{draft}"
+)
 
 def review_safety(state: ProtocolState) -> dict:
     """
     Safety Agent that reviews the current draft for risky content using an LLM.
     Returns partial update merging into feedback.
     """
-    current_draft = state.get("current_draft", "")
-    llm = get_llm()
+    return evaluate_safety(state.get("current_draft", ""))
+
+def evaluate_safety(current_draft: str, cancel_event: Optional[threading.Event] = None) -> dict:
+    """
+    Score a draft and return the safety state update.
+    Raises CriticCancelled if `cancel_event` is set before the LLM finishes.
+    """
+    # Clear-cut drafts (red flags, or clean and well-framed) are decided without the LLM
+    screening = screen(current_draft)
+    if screening.decided:
+        return {
+            "safety_score": screening.score,
+            "feedback_from_agents": {"safety": screening.feedback}
+        }
+
+    llm = get_llm("safety")
     
     if not llm:
         return {
             "safety_score": 1.0,
             "feedback_from_agents": {"safety": "LLM not available. Assuming safe."}
         }
-    
-    prompt = (
-        "You are a Clinical Safety Supervisor. "
-        "Review the following CBT protocol for any risk of self-harm, medical advice, or dangerous instructions.\n"
-        "Output ONLY a JSON-like string in this format:\n"
-        "Score: <1.0 for Safe, 0.5 for Warning, 0.0 for Critical>\n"
-        "Feedback: <one sentence safety assessment>\n\n"
-        f"Draft:\n{current_draft}"
-    )
+
+    # Identical draft + prompt + model -> reuse the previous verdict
+    cache_key = critique_cache.key(SAFETY_PROMPT, llm_identity(llm), current_draft)
+    cached = critique_cache.get(cache_key)
+    if cached:
+        return {
+            "safety_score": cached["score"],
+            "feedback_from_agents": {"safety": cached["feedback"]}
+        }
+
+    prompt = SAFETY_PROMPT.format(draft=current_draft)
     
     try:
-        response = llm.invoke([HumanMessage(content=prompt)]).content
+        response = invoke_llm(llm, [HumanMessage(content=prompt)], cancel_event)
         
         # Parse Score
-        score_match = re.search(r"Score:\s*([\d\.]+)", response)
+        score_match = SCORE_LINE.search(response)
         score = float(score_match.group(1)) if score_match else 1.0
         
         # Parse Feedback
-        feedback_match = re.search(r"Feedback:\s*(.+)", response, re.DOTALL)
+        feedback_match = FEEDBACK_LINE.search(response)
         notes = feedback_match.group(1).strip() if feedback_match else response
         
+    except CriticCancelled:
+        raise
     except Exception as e:
-        import sys
         print(f"Safety Agent Error: {e}", file=sys.stderr)
         score = 0.5
         notes = "Error during safety evaluation."
+    else:
+        critique_cache.set(cache_key, {"score": score, "feedback": notes})
 
     return {
         "safety_score": score,
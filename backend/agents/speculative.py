@@ -0,0 +1,130 @@
+import contextvars
+import itertools
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.runnables.config import merge_configs, var_child_runnable_config
+from langgraph.constants import TAG_NOSTREAM
+
+from backend.state import ProtocolState
+from backend.drafts import draft_store
+from backend.agents.drafter import generate_draft
+from backend.agents.safety import evaluate_safety
+from backend.agents.empathy import evaluate_empathy
+from backend.agents.fused import evaluate_fused
+from backend.agents.supervisor import supervisor_node
+
+# Candidate drafts generated per iteration (K). 1 disables speculative drafting.
+DRAFT_CANDIDATES = int(os.getenv("DRAFT_CANDIDATES", "1"))
+# Most candidates one thread may generate over all its iterations. Once fewer than two
+# remain, the drafter falls back to a single draft per iteration.
+DRAFT_CANDIDATE_BUDGET = int(os.getenv("DRAFT_CANDIDATE_BUDGET", str(2 * DRAFT_CANDIDATES)))
+# Temperatures handed out to candidates in turn.
+DRAFT_CANDIDATE_TEMPERATURES = [
+    float(t) for t in os.getenv("DRAFT_CANDIDATE_TEMPERATURES", "0.7,0.4,1.0").split(",") if t.strip()
+]
+
+# Prompt variants handed out in turn; the first candidate keeps the plain prompt.
+VARIANTS = (
+    None,
+    "Emphasise warmth, validation and a supportive tone.",
+    "Emphasise safety: gentle pacing, clear boundaries and when to seek professional help.",
+    "Keep it concise: few, concrete steps.",
+)
+
+
+def _quiet(fn, *args):
+    """
+    Run `fn` with LLM token streaming disabled: K candidates generated at once would
+    interleave their tokens on the thread's event stream.
+    """
+    var_child_runnable_config.set(merge_configs(var_child_runnable_config.get(), {"tags": [TAG_NOSTREAM]}))
+    return fn(*args)
+
+
+def score_draft(pool: ThreadPoolExecutor, draft: str) -> dict:
+    """Critique one draft with the configured critics; safety and empathy run concurrently."""
+    from backend.graph import CRITIC_MODE
+
+    if CRITIC_MODE == "fused":
+        return evaluate_fused(draft)
+
+    empathy = pool.submit(contextvars.copy_context().run, evaluate_empathy, draft)
+    safety = evaluate_safety(draft)
+    empathy = empathy.result()
+    return {
+        "safety_score": safety["safety_score"],
+        "empathy_score": empathy["empathy_score"],
+        "feedback_from_agents": {**safety["feedback_from_agents"], **empathy["feedback_from_agents"]},
+    }
+
+
+def candidate_rank(state: dict, verdict: dict) -> tuple:
+    """Candidates the supervisor would approve first, then by safety, then by empathy."""
+    approved = supervisor_node({**state, **verdict}) == "approve"
+    # A draft failing the safety pre-screen has no empathy score
+    return approved, verdict["safety_score"], verdict.get("empathy_score", 0.0)
+
+
+def draft_best_of_n(state: ProtocolState) -> dict:
+    """
+    Speculative drafter: generates K candidate drafts concurrently (varied temperature and
+    prompt), critiques each as soon as it is written, and advances the best one.
+
+    Returns the drafter update plus the critics' scores and feedback for the chosen draft,
+    so the graph goes straight to the supervisor.
+    """
+    current_draft = state.get("current_draft")
+    user_intent = state.get("user_intent", "")
+    feedback = state.get("feedback_from_agents", {})
+    iteration = state.get("iteration_count", 0)
+    used = state.get("candidates_generated", 0)
+
+    k = max(1, min(DRAFT_CANDIDATES, DRAFT_CANDIDATE_BUDGET - used))
+    temperatures = itertools.cycle(DRAFT_CANDIDATE_TEMPERATURES or [None])
+    variants = itertools.cycle(VARIANTS)
+    settings = [(next(temperatures), next(variants)) if k > 1 else (None, None) for _ in range(k)]
+
+    # k candidate workers plus one concurrent critic call each
+    pool = ThreadPoolExecutor(max_workers=2 * k, thread_name_prefix="candidate")
+
+    def candidate(temperature, variant) -> tuple[str, dict]:
+        draft = generate_draft(user_intent, feedback, iteration, temperature, variant)
+        return draft, score_draft(pool, draft)
+
+    try:
+        futures = [
+            pool.submit(contextvars.copy_context().run, _quiet, candidate, temperature, variant)
+            for temperature, variant in settings
+        ]
+        candidates = [future.result() for future in futures]
+    finally:
+        pool.shutdown(wait=False)
+
+    ranking_state = {**state, "iteration_count": iteration + 1}
+    best = max(range(k), key=lambda i: candidate_rank(ranking_state, candidates[i][1]))
+    draft_content, verdict = candidates[best]
+    print(f"--- [Drafter] Picked candidate {best + 1}/{k} (safety {verdict['safety_score']}, "
+          f"empathy {verdict.get('empathy_score')}) ---", file=sys.stderr)
+
+    updates = {
+        "user_intent": user_intent,
+        "current_draft": draft_content,
+        "iteration_count": iteration + 1,
+        "status": "reviewing",
+        "candidates_generated": used + k,
+        "safety_score": verdict["safety_score"],
+        "unscored": verdict.get("unscored", []),
+        # Replaces the previous round's feedback, like the drafter's reset
+        "feedback_from_agents": {"__RESET__": True, **verdict["feedback_from_agents"]},
+    }
+
+    if "empathy_score" in verdict:
+        updates["empathy_score"] = verdict["empathy_score"]
+
+    if current_draft:
+        previous = state.get("previous_drafts") or []
+        updates["previous_drafts"] = [draft_store.put(current_draft, base=previous[-1] if previous else None)]
+
+    return updates
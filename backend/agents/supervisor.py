@@ -1,39 +1,212 @@
-from typing import Literal
+from dataclasses import dataclass, fields, replace
+from functools import lru_cache
+from typing import Literal, Optional
 from backend.state import ProtocolState
+import itertools
+import json
+import os
+import re
+
+# Range each critic can report; used to check whether a missing verdict could still change the decision.
+SCORE_BOUNDS = {
+    "safety_score": (0.0, 1.0),
+    "empathy_score": (1.0, 5.0),
+}
+
+# JSON file with per-intent and per-tenant policy overrides (see SupervisorPolicy and README):
+# {"intents": [{"match": "<regex>", "empathy_threshold": 3.5}], "tenants": {"acme": {"max_iterations": 3}}}
+SUPERVISOR_POLICY_FILE = os.getenv("SUPERVISOR_POLICY_FILE", "")
+
+
+@dataclass(frozen=True)
+class SupervisorPolicy:
+    """When the supervisor approves, sends a draft back for revision, or halts for human review."""
+    name: str = "default"
+    # Minimum scores for approval
+    safety_threshold: float = float(os.getenv("SUPERVISOR_SAFETY_THRESHOLD", "0.8"))
+    empathy_threshold: float = float(os.getenv("SUPERVISOR_EMPATHY_THRESHOLD", "3.0"))
+    # Drafts per run before halting whatever the scores
+    max_iterations: int = int(os.getenv("SUPERVISOR_MAX_ITERATIONS", "2"))
+    # Halt instead of revising when the last revision raised the scores by less than this
+    # (sum of the score gains, each as a fraction of its range; 0 disables)
+    min_improvement: float = float(os.getenv("SUPERVISOR_MIN_IMPROVEMENT", "0.05"))
+    # Per-thread budgets (0 = unlimited): halt instead of revising when another round, at the
+    # average cost of the rounds so far, would exceed them. Time excludes waiting for a human.
+    token_budget: int = int(os.getenv("SUPERVISOR_TOKEN_BUDGET", "0"))
+    time_budget_seconds: float = float(os.getenv("SUPERVISOR_TIME_BUDGET_SECONDS", "0"))
+
+
+DEFAULT_POLICY = SupervisorPolicy()
+POLICY_FIELDS = {f.name for f in fields(SupervisorPolicy)} - {"name"}
+
+
+def _overrides(values: dict, source: str) -> dict:
+    unknown = set(values) - POLICY_FIELDS - {"match", "name"}
+    if unknown:
+        raise ValueError(f"{source}: unknown policy setting(s) {', '.join(sorted(unknown))}")
+    return {k: v for k, v in values.items() if k in POLICY_FIELDS}
+
+
+@lru_cache(maxsize=1)
+def load_policies(path: str = SUPERVISOR_POLICY_FILE) -> tuple[list, dict]:
+    """([(intent pattern, name, overrides)], {tenant: overrides}) from the policy file."""
+    if not path:
+        return [], {}
+    with open(path) as f:
+        config = json.load(f)
+    intents = [
+        (re.compile(rule["match"], re.IGNORECASE), rule.get("name") or f"intent:{rule['match']}",
+         _overrides(rule, f"{path} intents[{i}]"))
+        for i, rule in enumerate(config.get("intents", []))
+    ]
+    tenants = {tenant: _overrides(values, f"{path} tenants.{tenant}")
+               for tenant, values in config.get("tenants", {}).items()}
+    return intents, tenants
+
+
+def policy_for(state: ProtocolState) -> SupervisorPolicy:
+    """
+    The defaults, overridden by the first intent rule matching the user intent, then by the
+    thread's tenant.
+    """
+    intents, tenants = load_policies()
+    policy = DEFAULT_POLICY
+    for pattern, name, overrides in intents:
+        if pattern.search(state.get("user_intent") or ""):
+            policy = replace(policy, name=name, **overrides)
+            break
+    tenant = state.get("tenant")
+    if tenant in tenants:
+        name = f"tenant:{tenant}" if policy is DEFAULT_POLICY else f"{policy.name}+tenant:{tenant}"
+        policy = replace(policy, name=name, **tenants[tenant])
+    return policy
+
+
+def score_gain(previous: dict, current: dict) -> float:
+    """Sum of the score changes between two iterations, each as a fraction of its range."""
+    gain = 0.0
+    for key, (low, high) in SCORE_BOUNDS.items():
+        if previous.get(key) is not None and current.get(key) is not None:
+            gain += (current[key] - previous[key]) / (high - low)
+    return gain
+
+
+def decide(state: ProtocolState, policy: Optional[SupervisorPolicy] = None) -> tuple[str, str]:
+    """
+    The supervisor's (decision, reason). Reasons: approved, max_iterations, stalled,
+    token_budget, time_budget, or the failing check (safety/empathy) for a revision.
+
+    Every score can only move the decision up halt -> revise -> approve: stalling is measured
+    on the combined gain, so a better score never turns a revision into a halt.
+    """
+    policy = policy or policy_for(state)
+    safety_score = state.get("safety_score", 0.0)
+    empathy_score = state.get("empathy_score", 0.0)
+    iteration = state.get("iteration_count", 0)
+
+    # Halt at the iteration limit even when the scores pass: the draft still goes to a human
+    if iteration >= policy.max_iterations:
+        return "halt", "max_iterations"
+    if safety_score >= policy.safety_threshold and empathy_score >= policy.empathy_threshold:
+        return "approve", "approved"
+
+    # Scores of the earlier iterations of this thread (the supervisor appends the current one)
+    history = [entry for entry in state.get("score_history") or [] if entry.get("iteration", 0) < iteration]
+    if history and policy.min_improvement > 0:
+        measured = {**state, **{key: None for key in state.get("unscored") or []}}
+        if score_gain(history[-1], measured) < policy.min_improvement:
+            return "halt", "stalled"
+
+    rounds = len(history) + 1
+    tokens_used = state.get("tokens_used", 0)
+    if policy.token_budget and tokens_used + tokens_used / rounds > policy.token_budget:
+        return "halt", "token_budget"
+    elapsed = state.get("elapsed_s", 0.0)
+    if policy.time_budget_seconds and elapsed + elapsed / rounds > policy.time_budget_seconds:
+        return "halt", "time_budget"
+
+    return "revise", "safety" if safety_score < policy.safety_threshold else "empathy"
+
 
 def supervisor_node(state: ProtocolState) -> Literal["revise", "halt", "approve"]:
     """
     Supervisor Agent that governs the workflow.
-    
+
     Decisions:
     - 'revise': Send back to drafter for improvements.
-    - 'halt': Stop execution for human review (max iterations reached).
+    - 'halt': Stop execution for human review (iteration limit, stalled scores or budget).
     - 'approve': content meets quality standards.
     """
-    safety_score = state.get("safety_score", 0.0)
-    empathy_score = state.get("empathy_score", 0.0)
-    iteration = state.get("iteration_count", 0)
-    
-    # 1. Check Safety (Critical)
-    if safety_score < 0.8:
-        # If we have hit the iteration limit, we must halt even if failing
-        if iteration >= 2:
-            return "halt"
-        return "revise"
-
-    # 2. Check Empathy (Quality)
-    if empathy_score < 3.0:
-        if iteration >= 2:
-            return "halt"
-        return "revise"
-        
-    # 3. If scores are good, check strictly for iteration limit?
-    # Actually, if scores are good, we should probably approve.
-    # But if the prompt rule "If iteration >= 2 -> halt" is strict:
-    if iteration >= 2:
-        return "halt"
-
-    # 4. If scores are good and within iteration limits -> Approve
-    # (Interpreting "Otherwise -> revise" as "Otherwise -> approve" 
-    # to allow successful completion without maxing out iterations)
-    return "approve"
+    return decide(state)[0]
+
+def verdict_is_final(state: ProtocolState, pending: list[str]) -> bool:
+    """
+    True if `supervisor_node` reaches the same decision whatever the pending critics report.
+
+    `pending` lists the score keys still missing (e.g. ["empathy_score"]). The decision is
+    monotonic in every score, so checking the extremes of each range is enough.
+    """
+    decisions = {
+        supervisor_node({**state, "unscored": [], **dict(zip(pending, scores))})
+        for scores in itertools.product(*(SCORE_BOUNDS[key] for key in pending))
+    }
+    return len(decisions) == 1
+
+
+# --- Tuning ---
+
+def summarize_decisions(lines) -> dict:
+    """
+    Per policy, from SUPERVISOR_DECISION_LOG lines: decisions by reason, the score gain
+    each revision achieved, and the tokens / seconds spent per thread.
+    """
+    policies: dict = {}
+    last_by_thread: dict = {}
+    for line in lines:
+        event = json.loads(line)
+        summary = policies.setdefault(event.get("policy", "default"), {"decisions": {}, "revision_gains": [], "threads": {}})
+        key = f"{event['decision']}:{event['reason']}"
+        summary["decisions"][key] = summary["decisions"].get(key, 0) + 1
+        summary["threads"][event.get("thread_id")] = (event.get("tokens_used") or 0, event.get("elapsed_s") or 0.0)
+        previous = last_by_thread.get(event.get("thread_id"))
+        if previous and previous["decision"] == "revise" and event.get("iteration", 0) > previous.get("iteration", 0):
+            summary["revision_gains"].append(score_gain(previous, event))
+        last_by_thread[event.get("thread_id")] = event
+    return policies
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Supervisor policy tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    report = sub.add_parser("report", help="summarize a decision log (SUPERVISOR_DECISION_LOG)")
+    report.add_argument("log")
+    sub.add_parser("show", help="print the default policy and the policy file overrides")
+    args = parser.parse_args()
+
+    if args.command == "show":
+        print(json.dumps(DEFAULT_POLICY.__dict__, indent=2))
+        intents, tenants = load_policies()
+        for pattern, name, overrides in intents:
+            print(f"{name} (/{pattern.pattern}/): {json.dumps(overrides)}")
+        for tenant, overrides in tenants.items():
+            print(f"tenant:{tenant}: {json.dumps(overrides)}")
+        return
+
+    with open(args.log) as f:
+        policies = summarize_decisions(line for line in f if line.strip())
+    for name, summary in sorted(policies.items()):
+        threads = summary["threads"].values()
+        gains = summary["revision_gains"]
+        print(f"{name}: {len(threads)} threads, "
+              f"{sum(t for t, _ in threads) / len(threads):.0f} tokens and {sum(s for _, s in threads) / len(threads):.1f}s per thread")
+        for key, count in sorted(summary["decisions"].items(), key=lambda item: -item[1]):
+            print(f"  {key:<28} {count}")
+        if gains:
+            print(f"  revisions: {len(gains)}, mean gain {sum(gains) / len(gains):+.3f}, "
+                  f"{sum(g < DEFAULT_POLICY.min_improvement for g in gains)} below min_improvement")
+
+
+if __name__ == "__main__":
+    main()
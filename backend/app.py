@@ -1,10 +1,69 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from typing import Annotated, Literal, Optional
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from backend.graph import graph
-import uuid
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, StringConstraints
+from backend import runtime
+from backend.jobs import job_queue, QueueFullError, JobConflictError
+from backend.batch import run_batch, BATCH_MAX_INTENTS
+from backend.streaming import event_bus, TERMINAL_EVENTS
+from backend import metrics
+from backend.cache import critique_cache
+from backend.intents import intent_cache
+from backend.drafts import draft_store, hydrate_state
+from backend.state import ProtocolState
+from backend.thread_index import thread_index
+from backend.graph import preload_graph
+from backend.sharding import check_backend, new_thread_id, owns
+import asyncio
+import hashlib
+import json
 
-app = FastAPI()
+try:
+    import orjson  # installed with langgraph/langsmith
+
+    class DefaultResponse(JSONResponse):
+        """JSON response rendered with orjson, several times faster on large draft payloads."""
+
+        def render(self, content) -> bytes:
+            return orjson.dumps(content, default=str, option=orjson.OPT_NON_STR_KEYS)
+except ImportError:
+    DefaultResponse = JSONResponse
+
+# Seconds between SSE keep-alive comments while a run is quiet (e.g. waiting on the LLM)
+STREAM_HEARTBEAT_SECONDS = 15
+# Page size bounds for GET /thread/{id}/drafts and GET /threads
+DRAFTS_PAGE_DEFAULT = 20
+DRAFTS_PAGE_MAX = 100
+THREADS_PAGE_DEFAULT = 50
+THREADS_PAGE_MAX = 500
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    from backend.checkpointing import CHECKPOINT_BACKEND
+
+    check_backend(CHECKPOINT_BACKEND)
+    # Compile the graph in the background; requests arriving before it is ready wait for it
+    preload_graph()
+    await job_queue.start()
+    yield
+    await job_queue.stop()
+
+app = FastAPI(lifespan=lifespan, default_response_class=DefaultResponse)
+
+metrics.registry.gauge("flowstate_job_queue_depth", "Jobs waiting in the queue", lambda: job_queue.depth)
+metrics.registry.gauge("flowstate_jobs_running", "Jobs currently running", lambda: job_queue.running)
+metrics.registry.gauge("flowstate_critique_cache_hits_total", "Critique cache hits", lambda: critique_cache.hits, "counter")
+metrics.registry.gauge("flowstate_critique_cache_misses_total", "Critique cache misses", lambda: critique_cache.misses, "counter")
+metrics.registry.gauge("flowstate_intent_cache_hits_total", "Intent cache hits (exact or near-duplicate)", lambda: intent_cache.hits, "counter")
+metrics.registry.gauge("flowstate_intent_cache_misses_total", "Intent cache misses", lambda: intent_cache.misses, "counter")
+metrics.registry.gauge("flowstate_intent_cache_evictions_total", "Intent cache entries expired or evicted", lambda: intent_cache.evictions, "counter")
+def open_circuits() -> int:
+    from backend.resilience import open_circuits  # deferred: loads LangChain's chat model stack
+    return open_circuits()
+
+metrics.registry.gauge("flowstate_llm_open_circuits", "LLM endpoints whose circuit breaker is open or half-open", open_circuits)
 
 # Allow CORS for frontend
 app.add_middleware(
@@ -15,54 +74,269 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Client- or router-assigned thread ids
+ThreadId = Annotated[str, StringConstraints(pattern=r"^[\w.:-]{1,128}$")]
+
 class InitRequest(BaseModel):
     user_intent: str
+    thread_id: Optional[ThreadId] = None
+    tenant: Optional[str] = None  # selects the supervisor policy
+
+class BatchRequest(BaseModel):
+    intents: list[str]
+    thread_ids: Optional[list[ThreadId]] = None
+    tenant: Optional[str] = None
 
 class ResumeRequest(BaseModel):
     current_draft: str
     action: str = "approve"
     feedback: str = None
 
+def parse_fields(fields: Optional[str]) -> Optional[set]:
+    """`?fields=current_draft,safety_score` -> set of state keys (None means all)."""
+    if fields is None:
+        return None
+    selected = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = selected - set(ProtocolState.__annotations__)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return selected
+
+def project(values: dict, fields: Optional[set]) -> dict:
+    if fields is None:
+        return values
+    return {key: value for key, value in values.items() if key in fields}
+
+def state_etag(snapshot, *parts) -> str:
+    """Weak ETag for a thread read: the checkpoint id plus whatever else shapes the response."""
+    checkpoint_id = (snapshot.config or {}).get("configurable", {}).get("checkpoint_id")
+    digest = hashlib.sha1(json.dumps([checkpoint_id, *parts], default=str).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+def not_modified(request: Request, etag: str) -> bool:
+    candidates = {tag.strip() for tag in request.headers.get("if-none-match", "").split(",")}
+    return etag in candidates or "*" in candidates
+
+async def check_new_thread(thread_id: str):
+    """A caller-chosen id must belong to this shard (421 otherwise) and not exist yet (409)."""
+    if not owns(thread_id):
+        raise HTTPException(status_code=421, detail=f"Thread {thread_id} belongs to another shard")
+    snapshot = await runtime.get_state({"configurable": {"thread_id": thread_id}}, fields=set())
+    if snapshot.created_at is not None:
+        raise HTTPException(status_code=409, detail=f"Thread {thread_id} already exists")
+
+def enqueue_job(thread_id: str, input, updates: Optional[dict] = None) -> JSONResponse:
+    """
+    Queue a graph run and answer 202 immediately (or 429 when saturated). `updates` are
+    written to the thread by the job itself, so nothing changes if it is not admitted.
+    """
+    try:
+        job_queue.submit(thread_id, input, updates)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except JobConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    return JSONResponse(status_code=202, content={
+        "thread_id": thread_id,
+        "job": job_queue.describe(thread_id),
+        "status": "queued"
+    })
+
 @app.post("/thread")
-async def start_thread(request: InitRequest):
-    """Start a new protocol generation workflow."""
-    thread_id = str(uuid.uuid4())
+async def start_thread(request: InitRequest, mode: Literal["sync", "job"] = "sync", fields: Optional[str] = None):
+    """Start a new protocol generation workflow. `fields` limits the state keys returned."""
+    selected = parse_fields(fields)
+    thread_id = request.thread_id or new_thread_id()
     initial_input = {"user_intent": request.user_intent}
+    if request.tenant:
+        initial_input["tenant"] = request.tenant
     config = {"configurable": {"thread_id": thread_id}}
-    
+    if request.thread_id:
+        await check_new_thread(thread_id)
+
+    if mode == "job":
+        return enqueue_job(thread_id, initial_input)
+
     # Run until interrupt or end
     # invoke returns the state at the end of execution (or interruption)
-    result = graph.invoke(initial_input, config=config)
-    
-    snapshot = graph.get_state(config)
-    
+    result = await runtime.run_graph(initial_input, config)
+
+    snapshot = await runtime.get_state(config, fields=set())
+
     return {
         "thread_id": thread_id,
-        "state": result,
+        "state": project(result, selected),
         "next": snapshot.next,
         "status": "interrupted" if snapshot.next else "completed"
     }
 
+@app.post("/threads/batch")
+async def start_batch(request: BatchRequest):
+    """
+    Start one workflow per intent and stream results as NDJSON, one line per thread in
+    the order the runs finish, followed by a `batch_end` summary line.
+    """
+    if not request.intents:
+        raise HTTPException(status_code=400, detail="No intents given")
+    if len(request.intents) > BATCH_MAX_INTENTS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_INTENTS} intents per batch")
+    if request.thread_ids is not None:
+        if len(request.thread_ids) != len(request.intents) or len(set(request.thread_ids)) != len(request.thread_ids):
+            raise HTTPException(status_code=400, detail="thread_ids must give one distinct id per intent")
+        for thread_id in request.thread_ids:
+            await check_new_thread(thread_id)
+
+    async def results():
+        counts = {"interrupted": 0, "completed": 0, "failed": 0}
+        batch_id = None
+        async for result in run_batch(request.intents, thread_ids=request.thread_ids, tenant=request.tenant):
+            batch_id = result["batch_id"]
+            counts[result["status"]] += 1
+            yield json.dumps({"event": "result", **result}, default=str) + "\n"
+        yield json.dumps({"event": "batch_end", "batch_id": batch_id, **counts}) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+@app.get("/threads")
+async def list_threads(
+    status: Optional[Literal["drafting", "reviewing", "halted", "approved"]] = None,
+    interrupted: Optional[bool] = None,
+    created_after: Optional[float] = None,
+    created_before: Optional[float] = None,
+    q: Optional[str] = None,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(THREADS_PAGE_DEFAULT, ge=1, le=THREADS_PAGE_MAX),
+):
+    """
+    List threads, newest first, from the thread index (no checkpoint is read).
+
+    Filter by `status`, `interrupted=true` (waiting at human_review, i.e. the review queue),
+    creation time range (Unix seconds) and full-text `q` over the intent and current draft.
+    """
+    threads, total = await asyncio.to_thread(
+        thread_index.search, status, interrupted, created_after, created_before, q, limit, offset
+    )
+    return {"threads": threads, "total": total, "offset": offset, "limit": limit}
+
 @app.get("/thread/{thread_id}")
-async def get_thread_state(thread_id: str):
-    """Get the current state of a workflow thread."""
+async def get_thread_state(thread_id: str, request: Request, fields: Optional[str] = None):
+    """
+    Get the current state of a workflow thread.
+
+    `fields` (comma-separated state keys) limits the returned state; draft history is only
+    loaded when `previous_drafts` is requested. Responses carry an ETag derived from the
+    checkpoint id, and a matching If-None-Match gets 304 without a body.
+    """
+    selected = parse_fields(fields)
     config = {"configurable": {"thread_id": thread_id}}
-    snapshot = graph.get_state(config)
-    
+    snapshot = await runtime.get_state(config, fields=selected, hydrate=False)
+
     if not snapshot:
         raise HTTPException(status_code=404, detail="Thread not found")
-        
-    return {
-        "state": snapshot.values,
+
+    # Queued/running/failed jobs take precedence over the checkpoint status
+    job = job_queue.describe(thread_id)
+    if job and job["status"] != "done":
+        status = job["status"]
+    else:
+        status = "interrupted" if snapshot.next else "completed"
+
+    etag = state_etag(snapshot, sorted(selected) if selected is not None else None, job)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    return DefaultResponse(headers=headers, content={
+        "state": await asyncio.to_thread(hydrate_state, snapshot.values),
         "next": snapshot.next,
-        "status": "interrupted" if snapshot.next else "completed"
-    }
+        "status": status,
+        "job": job
+    })
+
+@app.get("/thread/{thread_id}/drafts")
+async def get_thread_drafts(
+    thread_id: str,
+    request: Request,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(DRAFTS_PAGE_DEFAULT, ge=1, le=DRAFTS_PAGE_MAX),
+):
+    """Page through a thread's draft history (`previous_drafts`, oldest first)."""
+    config = {"configurable": {"thread_id": thread_id}}
+    snapshot = await runtime.get_state(config, fields={"previous_drafts"}, hydrate=False)
+    if snapshot.created_at is None:
+        raise HTTPException(status_code=404, detail="Thread not found")
+
+    etag = state_etag(snapshot, offset, limit)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    refs = snapshot.values.get("previous_drafts", [])
+    page = refs[offset:offset + limit]
+    return DefaultResponse(headers=headers, content={
+        "thread_id": thread_id,
+        "total": len(refs),
+        "offset": offset,
+        "limit": limit,
+        "drafts": await asyncio.to_thread(draft_store.resolve, page)
+    })
+
+def sse(event: dict) -> str:
+    return f"event: {event['event']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+@app.get("/thread/{thread_id}/stream")
+async def stream_thread(thread_id: str):
+    """
+    Server-Sent Events for a thread's active run: node_start/node_end, drafter tokens,
+    the human_review interrupt and a final run_end. Threads with nothing running get a
+    single `state` event.
+    """
+    queue, backlog = event_bus.subscribe(thread_id)
+
+    async def events():
+        if queue is None:
+            config = {"configurable": {"thread_id": thread_id}}
+            snapshot = await runtime.get_state(config)
+            yield sse({
+                "event": "state",
+                "thread_id": thread_id,
+                "state": snapshot.values,
+                "next": list(snapshot.next),
+                "status": "interrupted" if snapshot.next else "completed"
+            })
+            return
+
+        try:
+            for event in backlog:
+                yield sse(event)
+                if event["event"] in TERMINAL_EVENTS:
+                    return
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield sse(event)
+                if event["event"] in TERMINAL_EVENTS:
+                    return
+        finally:
+            event_bus.unsubscribe(thread_id, queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 @app.post("/thread/{thread_id}/resume")
-async def resume_thread(thread_id: str, request: ResumeRequest):
-    """Resume a workflow thread after human review."""
+async def resume_thread(thread_id: str, request: ResumeRequest, mode: Literal["sync", "job"] = "sync",
+                        fields: Optional[str] = None):
+    """Resume a workflow thread after human review. `fields` limits the state keys returned."""
+    selected = parse_fields(fields)
     config = {"configurable": {"thread_id": thread_id}}
-    snapshot = graph.get_state(config)
+    job = job_queue.get(thread_id)
+    if job and job.active:
+        raise HTTPException(status_code=409, detail=f"Thread {thread_id} already has a {job.status} job")
+
+    snapshot = await runtime.get_state(config, fields=set())
 
     if not snapshot.next:
          raise HTTPException(status_code=400, detail="Thread is already completed")
@@ -72,20 +346,33 @@ async def resume_thread(thread_id: str, request: ResumeRequest):
         "current_draft": request.current_draft,
         "human_action": request.action
     }
-    
+
     if request.feedback:
         updates["feedback_from_agents"] = {"human": request.feedback}
-        
-    graph.update_state(config, updates)
-    
+
+    if mode == "job":
+        return enqueue_job(thread_id, None, updates)
+
+    await runtime.update_state(config, updates)
+
     # Resume
-    result = graph.invoke(None, config=config)
-    
-    final_snapshot = graph.get_state(config)
-    
+    result = await runtime.run_graph(None, config)
+
+    final_snapshot = await runtime.get_state(config, fields=set())
+
     return {
         "thread_id": thread_id,
-        "state": result,
+        "state": project(result, selected),
         "next": final_snapshot.next,
         "status": "interrupted" if final_snapshot.next else "completed"
     }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus metrics: node/LLM latency, tokens, checkpoint writes, decisions, queue depth."""
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/thread/{thread_id}/trace")
+async def get_thread_trace(thread_id: str):
+    """Structured per-thread trace: node spans, LLM calls, checkpoint writes and supervisor decisions."""
+    return {"thread_id": thread_id, "events": metrics.traces.get(thread_id)}
@@ -0,0 +1,69 @@
+import asyncio
+import contextlib
+import os
+import sys
+import time
+import uuid
+from typing import AsyncIterator, Optional
+
+from backend import runtime
+from backend.sharding import new_thread_id
+
+# Largest number of intents accepted in one batch request.
+BATCH_MAX_INTENTS = int(os.getenv("BATCH_MAX_INTENTS", "100"))
+# Graph runs one batch keeps in flight. Every LLM call still waits for a backend slot
+# (LLM_MAX_IN_FLIGHT), which is the budget shared with interactive traffic; running a few
+# more graphs than there are slots keeps a request queued behind every slot.
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", str(runtime.GRAPH_CONCURRENCY)))
+
+
+async def _run_one(batch_id: str, index: int, intent: str, thread_id: str, slots: asyncio.Semaphore,
+                   tenant: Optional[str] = None, run_slots: Optional[asyncio.Semaphore] = None) -> dict:
+    # batch_id in the run metadata is what lowers this run's LLM calls below interactive ones
+    config = {"configurable": {"thread_id": thread_id}, "metadata": {"batch_id": batch_id}}
+    async with slots, run_slots or contextlib.nullcontext():
+        started = time.perf_counter()
+        try:
+            input = {"user_intent": intent, **({"tenant": tenant} if tenant else {})}
+            result = await runtime.run_graph(input, config)
+            snapshot = await runtime.get_state(config)
+        except Exception as e:
+            print(f"--- [Batch] {batch_id} intent {index} failed: {e} ---", file=sys.stderr)
+            return {"index": index, "intent": intent, "thread_id": thread_id, "status": "failed", "error": str(e)}
+
+    return {
+        "index": index,
+        "intent": intent,
+        "thread_id": thread_id,
+        "status": "interrupted" if snapshot.next else "completed",
+        "next": list(snapshot.next),
+        "state": result,
+        "duration_s": time.perf_counter() - started,
+    }
+
+
+async def run_batch(intents: list[str], concurrency: int = BATCH_CONCURRENCY,
+                    thread_ids: Optional[list[str]] = None, tenant: Optional[str] = None,
+                    run_slots: Optional[asyncio.Semaphore] = None) -> AsyncIterator[dict]:
+    """
+    Start one thread per intent and yield each result as soon as its run stops
+    (human review interrupt, completion or failure), in completion order.
+    `thread_ids` (one per intent) are used instead of fresh ids, e.g. when assigned by the router;
+    `tenant` selects the supervisor policy of every thread. `run_slots`, a semaphore shared
+    with other callers (e.g. the MCP server's tool slots), is held by every graph run as well.
+
+    Closing the iterator early cancels the runs that have not finished.
+    """
+    batch_id = str(uuid.uuid4())
+    slots = asyncio.Semaphore(max(concurrency, 1))
+    thread_ids = thread_ids or [new_thread_id() for _ in intents]
+    tasks = [asyncio.create_task(_run_one(batch_id, i, intent, thread_id, slots, tenant, run_slots))
+             for i, (intent, thread_id) in enumerate(zip(intents, thread_ids))]
+    print(f"--- [Batch] {batch_id}: {len(intents)} intents, {concurrency} in flight ---", file=sys.stderr)
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            result = await next_done
+            yield {"batch_id": batch_id, **result}
+    finally:
+        for task in tasks:
+            task.cancel()
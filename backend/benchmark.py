@@ -0,0 +1,240 @@
+"""
+End-to-end load benchmark for the API and MCP tools, driven by the fake LLM backend.
+
+    python -m backend.benchmark --threads 50 --concurrency 10
+    python -m backend.benchmark --llm http --latency-ms 300 --tokens-per-sec 40
+    python -m backend.benchmark --mcp --threads 20 --concurrency 5
+    python -m backend.benchmark --url http://localhost:8000 --threads 20   # an already running API
+
+`--llm inprocess` (default) uses FakeChatModel directly and measures pure orchestration
+overhead (graph, checkpointer, API). `--llm http` starts the Ollama-compatible stand-in from
+`backend.fake_llm` and routes the real ChatOllama client through it.
+
+Reports p50/p95/p99 latency per operation, throughput, per-node wall time and the bytes
+written to the checkpoint store. Each run uses a fresh checkpoint database and critique cache.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+
+INTENTS = [
+    "Create an exposure hierarchy for social anxiety",
+    "Design a thought record exercise for catastrophizing",
+    "Build a behavioural activation plan for low mood",
+    "Write a worry postponement exercise for generalized anxiety",
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="FlowState load benchmark")
+    parser.add_argument("--threads", type=int, default=20, help="protocol threads to run")
+    parser.add_argument("--concurrency", type=int, default=5, help="threads in flight at once")
+    parser.add_argument("--no-resume", action="store_true", help="skip the approve/resume step")
+    parser.add_argument("--mcp", action="store_true", help="drive the MCP tools instead of the REST API")
+    parser.add_argument("--url", help="benchmark a running API instead of an in-process app")
+    parser.add_argument("--llm", choices=["inprocess", "http"], default="inprocess")
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--tokens-per-sec", type=float, default=0, help="0 = instant generation")
+    parser.add_argument("--draft-tokens", type=int, default=120)
+    parser.add_argument("--safety-scores", default="1.0", help="comma-separated, returned in turn")
+    parser.add_argument("--empathy-scores", default="4.0", help="comma-separated, returned in turn")
+    parser.add_argument("--cache", action="store_true", help="keep the critique/intent caches and coalescing enabled")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    return parser.parse_args()
+
+
+def configure_environment(args) -> str:
+    """Point the backend at a scratch database and the fake LLM. Must run before backend imports."""
+    workdir = tempfile.mkdtemp(prefix="flowstate-bench-")
+    os.environ["CHECKPOINT_DB"] = os.path.join(workdir, "checkpoints.sqlite")
+    os.environ["CRITIQUE_CACHE_PATH"] = os.path.join(workdir, "critique_cache.sqlite")
+    os.environ["CRITIQUE_CACHE_ENABLED"] = "true" if args.cache else "false"
+    os.environ["INTENT_CACHE_PATH"] = os.path.join(workdir, "intent_cache.sqlite")
+    os.environ["INTENT_CACHE_ENABLED"] = "true" if args.cache else "false"
+    os.environ["INTENT_COALESCING"] = "true" if args.cache else "false"
+    os.environ["FAKE_LLM_LATENCY_MS"] = str(args.latency_ms)
+    os.environ["FAKE_LLM_TOKENS_PER_SEC"] = str(args.tokens_per_sec)
+    os.environ["FAKE_LLM_DRAFT_TOKENS"] = str(args.draft_tokens)
+    os.environ["FAKE_LLM_SAFETY_SCORES"] = args.safety_scores
+    os.environ["FAKE_LLM_EMPATHY_SCORES"] = args.empathy_scores
+    os.environ["LLM_PROVIDER"] = "fake" if args.llm == "inprocess" else "ollama"
+    for role in ("DRAFTER", "SAFETY", "EMPATHY", "CRITIC"):
+        for suffix in ("_PROVIDER", "_MODEL", "_BASE_URL"):
+            os.environ.pop(role + suffix, None)
+    return os.environ["CHECKPOINT_DB"]
+
+
+def percentiles(samples: list[float]) -> dict:
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pct(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {
+        "count": len(ordered),
+        "mean": statistics.fmean(ordered),
+        "p50": pct(50),
+        "p95": pct(95),
+        "p99": pct(99),
+        "max": ordered[-1],
+    }
+
+
+def checkpoint_bytes(path: str) -> int:
+    """Serialized bytes stored by the checkpointer (checkpoint + metadata + pending writes)."""
+    conn = sqlite3.connect(path)
+    try:
+        checkpoints = conn.execute("SELECT COALESCE(SUM(LENGTH(checkpoint) + LENGTH(metadata)), 0) FROM checkpoints").fetchone()[0]
+        writes = conn.execute("SELECT COALESCE(SUM(LENGTH(value)), 0) FROM writes").fetchone()[0]
+        return checkpoints + writes
+    except sqlite3.OperationalError:
+        return 0
+    finally:
+        conn.close()
+
+
+class NodeTimer:
+    """Collects node wall times from the event bus (in-process runs only)."""
+
+    def __init__(self):
+        self._started: dict[tuple[str, str], float] = {}
+        self.durations: dict[str, list[float]] = defaultdict(list)
+
+    def __call__(self, event: dict):
+        key = (event["thread_id"], event.get("node"))
+        if event["event"] == "node_start":
+            self._started[key] = event["ts"]
+        elif event["event"] == "node_end" and key in self._started:
+            self.durations[event["node"]].append(event["ts"] - self._started.pop(key))
+
+
+async def api_session(client, intent: str, resume: bool, latencies: dict):
+    started = time.perf_counter()
+    response = await client.post("/thread", json={"user_intent": intent})
+    response.raise_for_status()
+    latencies["start_thread"].append(time.perf_counter() - started)
+    body = response.json()
+
+    if resume and body["status"] == "interrupted":
+        started = time.perf_counter()
+        response = await client.post(f"/thread/{body['thread_id']}/resume", json={
+            "current_draft": body["state"]["current_draft"],
+            "action": "approve"
+        })
+        response.raise_for_status()
+        latencies["resume_thread"].append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    (await client.get(f"/thread/{body['thread_id']}")).raise_for_status()
+    latencies["get_thread"].append(time.perf_counter() - started)
+
+
+async def mcp_session(call_tool, intent: str, resume: bool, latencies: dict):
+    started = time.perf_counter()
+    result = await call_tool("generate_protocol", {"intent": intent})
+    latencies["generate_protocol"].append(time.perf_counter() - started)
+
+    thread_id = re.search(r"Thread ID: (\S+)", result[0].text).group(1)
+    if resume and "Waiting for Human Review" in result[0].text:
+        started = time.perf_counter()
+        await call_tool("review_protocol", {"thread_id": thread_id, "action": "approve"})
+        latencies["review_protocol"].append(time.perf_counter() - started)
+
+
+async def run(args) -> dict:
+    db_path = configure_environment(args)
+
+    server = None
+    if args.llm == "http" and not args.url:
+        from backend.fake_llm import serve
+        server = serve(port=0, latency_ms=args.latency_ms, tokens_per_sec=args.tokens_per_sec)
+        os.environ["OLLAMA_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}"
+
+    import httpx
+
+    timer = NodeTimer()
+    latencies: dict[str, list[float]] = defaultdict(list)
+    errors = 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=None)
+        session = lambda intent: api_session(client, intent, not args.no_resume, latencies)
+    else:
+        from backend.streaming import event_bus
+        event_bus.add_listener(timer)
+        if args.mcp:
+            from backend.mcp_server import call_tool
+            client = None
+            session = lambda intent: mcp_session(call_tool, intent, not args.no_resume, latencies)
+        else:
+            from backend.app import app
+            client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None)
+            session = lambda intent: api_session(client, intent, not args.no_resume, latencies)
+
+    async def one(i: int):
+        nonlocal errors
+        async with semaphore:
+            try:
+                await session(INTENTS[i % len(INTENTS)])
+            except Exception as e:
+                errors += 1
+                print(f"--- [Benchmark] Thread {i} failed: {e} ---")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.threads)))
+    elapsed = time.perf_counter() - started
+
+    if client:
+        await client.aclose()
+    if server:
+        server.shutdown()
+
+    report = {
+        "threads": args.threads,
+        "concurrency": args.concurrency,
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "throughput_threads_per_s": (args.threads - errors) / elapsed if elapsed else 0.0,
+        "latency_s": {op: percentiles(samples) for op, samples in latencies.items()},
+        "node_time_s": {node: percentiles(samples) for node, samples in timer.durations.items()},
+    }
+    if not args.url:
+        total = checkpoint_bytes(db_path)
+        report["checkpoint_bytes"] = {"total": total, "per_thread": total / max(args.threads, 1)}
+    return report
+
+
+def print_report(report: dict):
+    print(f"\nThreads: {report['threads']}  concurrency: {report['concurrency']}  errors: {report['errors']}")
+    print(f"Elapsed: {report['elapsed_s']:.2f}s  throughput: {report['throughput_threads_per_s']:.2f} threads/s")
+    for title, section in (("Latency", report["latency_s"]), ("Node wall time", report["node_time_s"])):
+        print(f"\n{title} (ms)      count     p50     p95     p99     max")
+        for name, stats in section.items():
+            print(f"  {name:<18}{stats['count']:>6}" + "".join(
+                f"{stats[k] * 1000:>8.1f}" for k in ("p50", "p95", "p99", "max")))
+    if "checkpoint_bytes" in report:
+        cb = report["checkpoint_bytes"]
+        print(f"\nCheckpoint bytes written: {cb['total']} ({cb['per_thread']:.0f} per thread)")
+
+
+def main():
+    args = parse_args()
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
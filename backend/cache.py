@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+CRITIQUE_CACHE_ENABLED = os.getenv("CRITIQUE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+CRITIQUE_CACHE_PATH = os.getenv("CRITIQUE_CACHE_PATH", "critique_cache.sqlite")
+CRITIQUE_CACHE_MAX_ENTRIES = int(os.getenv("CRITIQUE_CACHE_MAX_ENTRIES", "10000"))
+CRITIQUE_CACHE_TTL_SECONDS = float(os.getenv("CRITIQUE_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+
+def llm_identity(llm) -> str:
+    """Model name used in cache keys (ChatOllama uses `model`, ChatOpenAI `model_name`)."""
+    return str(getattr(llm, "model", None) or getattr(llm, "model_name", None) or llm.__class__.__name__)
+
+
+class EvaluationCache:
+    """
+    Persistent, content-addressed cache of critic verdicts.
+
+    Entries are keyed by a hash of prompt template + model + draft text, so an
+    unchanged draft (e.g. a resume that sends back the same `current_draft`) never
+    costs a second LLM call. Eviction is LRU on `last_used` with a TTL on `created_at`.
+    """
+
+    def __init__(self, path: str = CRITIQUE_CACHE_PATH, max_entries: int = CRITIQUE_CACHE_MAX_ENTRIES,
+                 ttl_seconds: float = CRITIQUE_CACHE_TTL_SECONDS, enabled: bool = CRITIQUE_CACHE_ENABLED):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @staticmethod
+    def key(template: str, model: str, draft: str) -> str:
+        digest = hashlib.sha256()
+        for part in (template, model, draft):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.executescript(
+                """
+                PRAGMA journal_mode=WAL;
+                CREATE TABLE IF NOT EXISTS critiques (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS critiques_last_used ON critiques (last_used);
+                """
+            )
+        return self._conn
+
+    def get(self, key: str) -> Optional[dict]:
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            row = db.execute("SELECT value, created_at FROM critiques WHERE key = ?", (key,)).fetchone()
+            if row and now - row[1] > self.ttl_seconds:
+                db.execute("DELETE FROM critiques WHERE key = ?", (key,))
+                db.commit()
+                self.evictions += 1
+                row = None
+            if not row:
+                self.misses += 1
+                return None
+            db.execute("UPDATE critiques SET last_used = ? WHERE key = ?", (now, key))
+            db.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: dict):
+        if not self.enabled:
+            return
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO critiques (key, value, created_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            count = db.execute("SELECT COUNT(*) FROM critiques").fetchone()[0]
+            if count > self.max_entries:
+                overflow = count - self.max_entries
+                db.execute(
+                    "DELETE FROM critiques WHERE key IN (SELECT key FROM critiques ORDER BY last_used LIMIT ?)",
+                    (overflow,),
+                )
+                self.evictions += overflow
+            db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db().execute("DELETE FROM critiques")
+            self._db().commit()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+critique_cache = EvaluationCache()
@@ -0,0 +1,109 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from backend.config import CHECKPOINT_DB
+from backend.metrics import instrument_checkpointer
+
+# Which checkpoint store backs the graph:
+# - "sqlite":      one shared connection (serialized by SqliteSaver's lock), WAL + tuned pragmas
+# - "sqlite_pool": one connection per worker thread; WAL lets reads run concurrently with a writer
+# - "postgres":    langgraph-checkpoint-postgres on a psycopg connection pool (CHECKPOINT_POSTGRES_URI)
+CHECKPOINT_BACKEND = os.getenv("CHECKPOINT_BACKEND", "sqlite")
+CHECKPOINT_POSTGRES_URI = os.getenv("CHECKPOINT_POSTGRES_URI", "")
+CHECKPOINT_POOL_SIZE = int(os.getenv("CHECKPOINT_POOL_SIZE", "10"))
+
+# Checkpoints are written after every node, so durability is traded for latency the way
+# WAL intends: NORMAL sync is crash-safe for the database, it can only lose the last commits
+# on power loss. busy_timeout makes concurrent writers wait instead of failing.
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-32000",  # 32 MB page cache
+    "PRAGMA mmap_size=268435456",  # 256 MB
+)
+
+
+def connect_sqlite(path: str = CHECKPOINT_DB) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False)
+    for pragma in SQLITE_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+class PooledSqliteSaver(SqliteSaver):
+    """
+    SqliteSaver with a connection per thread instead of one connection behind a global lock.
+
+    Graph runs execute on the bounded run executor, so the number of connections is capped
+    by GRAPH_CONCURRENCY (plus the read threads). WAL mode serializes writers inside SQLite
+    while readers proceed concurrently.
+    """
+
+    def __init__(self, path: str = CHECKPOINT_DB, **kwargs):
+        self._path = path
+        self._local = threading.local()
+        self._setup_lock = threading.Lock()
+        super().__init__(connect_sqlite(path), **kwargs)
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = connect_sqlite(self._path)
+        return conn
+
+    @conn.setter
+    def conn(self, value: sqlite3.Connection):
+        self._local.conn = value
+
+    def setup(self) -> None:
+        with self._setup_lock:
+            super().setup()
+
+    @contextmanager
+    def cursor(self, transaction: bool = True):
+        self.setup()
+        conn = self.conn
+        cur = conn.cursor()
+        try:
+            yield cur
+        finally:
+            if transaction:
+                conn.commit()
+            cur.close()
+
+
+def create_checkpointer(backend: str = CHECKPOINT_BACKEND):
+    """Build the checkpoint saver selected by CHECKPOINT_BACKEND, with write metrics attached."""
+    return instrument_checkpointer(_create_saver(backend))
+
+
+def _create_saver(backend: str):
+    if backend == "sqlite":
+        return SqliteSaver(connect_sqlite())
+
+    if backend == "sqlite_pool":
+        return PooledSqliteSaver()
+
+    if backend == "postgres":
+        # Optional dependencies: langgraph-checkpoint-postgres, psycopg[pool]
+        from langgraph.checkpoint.postgres import PostgresSaver
+        from psycopg.rows import dict_row
+        from psycopg_pool import ConnectionPool
+
+        pool = ConnectionPool(
+            CHECKPOINT_POSTGRES_URI,
+            max_size=CHECKPOINT_POOL_SIZE,
+            kwargs={"autocommit": True, "prepare_threshold": 0, "row_factory": dict_row},
+        )
+        saver = PostgresSaver(pool)
+        saver.setup()
+        return saver
+
+    raise ValueError(f"Unknown CHECKPOINT_BACKEND: {backend}")
@@ -1,10 +1,270 @@
-from langchain_ollama import ChatOllama
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+import contextvars
+import heapq
+import itertools
 import os
+import sys
+import threading
 
-def get_llm():
-    print("--- 🦙 Connecting to Ollama (gpt-oss:20b-cloud) ---")
-    return ChatOllama(
-        model="gpt-oss:20b-cloud",
-        base_url="http://localhost:11434",
-        temperature=0.7
+try:
+    from dotenv import load_dotenv
+    load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env"))
+except ImportError:
+    pass
+
+# Name of the shard this worker serves in a sharded deployment (see backend/sharding.py)
+SHARD_NAME = os.getenv("SHARD_NAME", "")
+
+# SQLite file holding LangGraph checkpoints (and the draft blob store); one per shard
+CHECKPOINT_DB = os.getenv("CHECKPOINT_DB") or (f"checkpoints-{SHARD_NAME}.sqlite" if SHARD_NAME else "checkpoints.sqlite")
+
+# Maximum concurrent requests sent to one backend (base URL), shared by every client
+# and thread in the process. Extra calls wait for a free slot instead of piling onto the server.
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "4"))
+
+
+@dataclass(frozen=True)
+class LLMSettings:
+    provider: str
+    model: str
+    base_url: str
+    temperature: float
+
+
+def llm_settings(role: str = "default") -> LLMSettings:
+    """
+    Resolve provider/model/base URL/temperature for a role ("drafter", "safety", "empathy",
+    or "critic" for the fused critic).
+
+    Role overrides (e.g. DRAFTER_MODEL, SAFETY_MODEL, EMPATHY_TEMPERATURE, SAFETY_BASE_URL)
+    fall back to the global settings, so a big drafter can sit next to small, fast critics.
+    """
+    prefix = role.upper() + "_"
+    provider = (os.getenv(prefix + "PROVIDER") or os.getenv("LLM_PROVIDER") or "ollama").lower()
+
+    if provider == "fake":
+        default_model = "fake"
+        default_url = "fake://local"
+    elif provider == "local":
+        default_model = os.getenv("LOCAL_LLM_MODEL", "llama-3-8b-instruct")
+        default_url = os.getenv("LOCAL_LLM_BASE_URL", "http://localhost:1234/v1")
+    elif provider == "openai":
+        default_model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+        default_url = os.getenv("OPENAI_BASE_URL", "")
+    else:
+        default_model = os.getenv("OLLAMA_MODEL", "gpt-oss:20b-cloud")
+        default_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+
+    return LLMSettings(
+        provider=provider,
+        model=os.getenv(prefix + "MODEL") or default_model,
+        base_url=os.getenv(prefix + "BASE_URL") or default_url,
+        temperature=float(os.getenv(prefix + "TEMPERATURE") or os.getenv("LLM_TEMPERATURE") or 0.7),
     )
+
+
+# --- Per-backend in-flight limits ---
+
+class PrioritySlot:
+    """
+    Counting semaphore that hands a freed slot to the waiter with the lowest
+    (priority, arrival) instead of whichever thread wakes first.
+    """
+
+    def __init__(self, size: int):
+        self._free = size
+        self._waiters: list[tuple[int, int, threading.Event]] = []
+        self._arrivals = itertools.count()
+        self._lock = threading.Lock()
+
+    def acquire(self, priority: int = 0, cancelled: Optional[threading.Event] = None) -> bool:
+        """Wait for a slot; False (holding nothing) if `cancelled` is set first."""
+        with self._lock:
+            if self._free and not self._waiters:
+                self._free -= 1
+                return True
+            waiter = (priority, next(self._arrivals), threading.Event())
+            heapq.heappush(self._waiters, waiter)
+        ready = waiter[2]  # the releasing thread hands its slot over directly
+        while not ready.wait(None if cancelled is None else 0.05):
+            if cancelled.is_set():
+                with self._lock:
+                    if not ready.is_set():
+                        self._waiters.remove(waiter)
+                        heapq.heapify(self._waiters)
+                        return False
+        if cancelled is not None and cancelled.is_set():
+            self.release()  # handed over as the wait was given up: pass it on
+            return False
+        return True
+
+    def release(self):
+        with self._lock:
+            if self._waiters:
+                heapq.heappop(self._waiters)[2].set()
+            else:
+                self._free += 1
+
+
+_slots: dict[str, PrioritySlot] = {}
+_slots_lock = threading.Lock()
+
+# Set by the resilience layer around one request attempt: (Event that abandons the wait for
+# a slot, callback run once the slot is held), so its timeout only counts time at the backend.
+slot_wait: contextvars.ContextVar = contextvars.ContextVar("slot_wait", default=None)
+
+
+class SlotWaitCancelled(Exception):
+    """The request was abandoned while queued for a backend slot."""
+
+
+def run_metadata() -> dict:
+    """Metadata of the run the current LLM call belongs to (graph node, batch id, ...)."""
+    from langchain_core.runnables.config import var_child_runnable_config
+
+    return (var_child_runnable_config.get() or {}).get("metadata") or {}
+
+
+def request_priority() -> int:
+    """
+    Priority of the LLM call being made from the current graph node (lower is served first).
+
+    Interactive runs go before batch runs. Within each, critic calls go before drafter calls:
+    a critique finishes a thread that is already half done, while a new draft starts more
+    work. With a saturated backend this interleaves one thread's critics with another
+    thread's drafter instead of running every draft before any critique.
+    """
+    metadata = run_metadata()
+    batch = 2 if metadata.get("batch_id") else 0
+    drafting = 1 if metadata.get("langgraph_node") == "drafter" else 0
+    return batch + drafting
+
+
+@contextmanager
+def backend_slot(base_url: str, priority: int = None):
+    """Hold one of the LLM_MAX_IN_FLIGHT request slots for a backend."""
+    with _slots_lock:
+        slot = _slots.get(base_url)
+        if slot is None:
+            slot = _slots[base_url] = PrioritySlot(LLM_MAX_IN_FLIGHT)
+    cancelled, on_acquired = slot_wait.get() or (None, None)
+    if not slot.acquire(request_priority() if priority is None else priority, cancelled):
+        raise SlotWaitCancelled(f"gave up waiting for a slot on {base_url}")
+    if on_acquired:
+        on_acquired()
+    try:
+        yield
+    finally:
+        slot.release()
+
+
+@lru_cache(maxsize=None)
+def _bounded(chat_cls, url_field: str):
+    """Subclass a chat model so every request (invoke or stream) holds a backend slot."""
+
+    class Bounded(chat_cls):
+        def _generate(self, *args, **kwargs):
+            with backend_slot(str(getattr(self, url_field))):
+                return super()._generate(*args, **kwargs)
+
+        def _stream(self, *args, **kwargs):
+            with backend_slot(str(getattr(self, url_field))):
+                yield from super()._stream(*args, **kwargs)
+
+    Bounded.__name__ = Bounded.__qualname__ = f"Pooled{chat_cls.__name__}"
+    return Bounded
+
+
+def _build_client(settings: LLMSettings, base_url: str):
+    """Client for one endpoint. Retries and timeouts of the call as a whole are handled by the caller."""
+    import httpx
+    from backend.resilience import LLM_TIMEOUT_SECONDS
+
+    # Keep-alive pool sized to the in-flight limit so every slot reuses a warm connection.
+    limits = httpx.Limits(max_connections=LLM_MAX_IN_FLIGHT, max_keepalive_connections=LLM_MAX_IN_FLIGHT)
+    # Bounds abandoned attempts (timed out or lost a hedge) that keep running in the background.
+    timeout = httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=min(LLM_TIMEOUT_SECONDS, 5.0))
+
+    if settings.provider == "fake":
+        from backend.fake_llm import FakeChatModel
+        return _bounded(FakeChatModel, "base_url")(model=settings.model, base_url=base_url)
+
+    if settings.provider in ("openai", "local"):
+        from langchain_openai import ChatOpenAI
+        api_key = os.getenv("LOCAL_LLM_API_KEY" if settings.provider == "local" else "OPENAI_API_KEY")
+        return _bounded(ChatOpenAI, "openai_api_base")(
+            model=settings.model,
+            base_url=base_url or None,
+            api_key=api_key,
+            temperature=settings.temperature,
+            max_retries=0,
+            http_client=httpx.Client(limits=limits, timeout=timeout),
+        )
+
+    from langchain_ollama import ChatOllama
+    return _bounded(ChatOllama, "base_url")(
+        model=settings.model,
+        base_url=base_url,
+        temperature=settings.temperature,
+        keep_alive=os.getenv("OLLAMA_KEEP_ALIVE"),
+        client_kwargs={"limits": limits, "timeout": timeout},
+    )
+
+
+def _build_llm(settings: LLMSettings):
+    """
+    One client per endpoint listed in the base URL (comma-separated), behind a
+    ResilientChatModel that balances, times out, retries and hedges the calls.
+    """
+    from backend.metrics import llm_metrics_handler
+    from backend.resilience import ResilientChatModel
+
+    urls = [url.strip() for url in settings.base_url.split(",") if url.strip()] or [settings.base_url]
+    if settings.provider == "fake":
+        probe_path = ""
+    elif settings.provider in ("openai", "local"):
+        probe_path = "/models"
+    else:
+        probe_path = "/api/version"
+
+    return ResilientChatModel(
+        backends=[(url, _build_client(settings, url)) for url in urls],
+        probe_path=probe_path,
+        model=settings.model,
+        callbacks=[llm_metrics_handler],
+    )
+
+
+# --- Process-wide client registry ---
+
+_clients: dict[LLMSettings, object] = {}
+_clients_lock = threading.Lock()
+
+
+def get_llm(role: str = "default"):
+    """
+    Return the shared chat model for a role.
+
+    Clients are built once per distinct settings and reused by every node call, so
+    HTTP connections stay pooled. Returns None for LLM_PROVIDER=mock, which makes the
+    agents use their fallback logic.
+    """
+    settings = llm_settings(role)
+    if settings.provider == "mock":
+        return None
+
+    with _clients_lock:
+        llm = _clients.get(settings)
+        if llm is None:
+            print(f"--- 🦙 Connecting to {settings.provider} ({settings.model}) for {role} ---", file=sys.stderr)
+            llm = _clients[settings] = _build_llm(settings)
+    return llm
+
+
+def reset_llm_clients():
+    """Drop cached clients, e.g. after changing LLM settings at runtime."""
+    with _clients_lock:
+        _clients.clear()
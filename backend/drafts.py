@@ -0,0 +1,170 @@
+import difflib
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from typing import Optional
+
+from backend.config import CHECKPOINT_DB
+
+# Prefix marking a `previous_drafts` entry as a reference into the draft store.
+DRAFT_REF_PREFIX = "draft:sha256:"
+# A draft is stored as a delta against the previous one when the delta is at most this
+# fraction of its size (typical for incremental revisions); otherwise in full.
+DRAFT_DELTA_MAX_RATIO = float(os.getenv("DRAFT_DELTA_MAX_RATIO", "0.5"))
+# Longest chain of deltas behind a draft; the next one is stored in full, bounding reads.
+DRAFT_DELTA_MAX_CHAIN = int(os.getenv("DRAFT_DELTA_MAX_CHAIN", "8"))
+
+
+def make_delta(base: str, text: str) -> list:
+    """
+    Line-level delta turning `base` into `text`: a positive int copies that many base
+    lines, a negative int skips them, a list inserts those lines.
+    """
+    a, b = base.splitlines(keepends=True), text.splitlines(keepends=True)
+    ops = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        if tag == "equal":
+            ops.append(i2 - i1)
+            continue
+        if i2 > i1:
+            ops.append(i1 - i2)
+        if j2 > j1:
+            ops.append(b[j1:j2])
+    return ops
+
+
+def apply_delta(base: str, delta: list) -> str:
+    lines, out, i = base.splitlines(keepends=True), [], 0
+    for op in delta:
+        if isinstance(op, list):
+            out.extend(op)
+        elif op > 0:
+            out.extend(lines[i:i + op])
+            i += op
+        else:
+            i -= op
+    return "".join(out)
+
+
+class DraftStore:
+    """
+    Content-addressed storage for draft texts.
+
+    `previous_drafts` holds short references instead of full texts, so each checkpoint
+    no longer re-serializes the whole draft history and identical drafts are stored once.
+    Blobs live in the checkpoint database next to the LangGraph tables. A draft revised
+    from the previous one can be kept as a line delta against it (`draft_deltas`); its
+    reference is still the hash of the full text, so readers never see the difference.
+    """
+
+    def __init__(self, path: str = CHECKPOINT_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS draft_blobs (hash TEXT PRIMARY KEY, text TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS draft_deltas ("
+                "hash TEXT PRIMARY KEY, base TEXT NOT NULL, depth INTEGER NOT NULL, delta TEXT NOT NULL)"
+            )
+        return self._conn
+
+    def _load(self, digest: str) -> Optional[tuple[str, int]]:
+        """(text, delta chain depth) of a stored draft; the caller holds the lock."""
+        db = self._db()
+        chain = []
+        while True:
+            row = db.execute("SELECT text FROM draft_blobs WHERE hash = ?", (digest,)).fetchone()
+            if row:
+                text = row[0]
+                break
+            row = db.execute("SELECT base, delta FROM draft_deltas WHERE hash = ?", (digest,)).fetchone()
+            if not row:
+                return None
+            digest = row[0]
+            chain.append(json.loads(row[1]))
+        for delta in reversed(chain):
+            text = apply_delta(text, delta)
+        return text, len(chain)
+
+    @staticmethod
+    def is_ref(value: str) -> bool:
+        return isinstance(value, str) and value.startswith(DRAFT_REF_PREFIX)
+
+    def put(self, text: str, base: Optional[str] = None) -> str:
+        """
+        Store a draft (once) and return its reference. With `base`, the reference of the
+        draft this one was revised from, only the delta is stored when it is small enough.
+        """
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            db = self._db()
+            stored = db.execute(
+                "SELECT 1 FROM draft_blobs WHERE hash = ? UNION ALL SELECT 1 FROM draft_deltas WHERE hash = ?",
+                (digest, digest),
+            ).fetchone()
+            if not stored:
+                based = self._load(base[len(DRAFT_REF_PREFIX):]) if self.is_ref(base) else None
+                delta = json.dumps(make_delta(based[0], text)) if based and based[1] < DRAFT_DELTA_MAX_CHAIN else None
+                if delta is not None and len(delta) <= DRAFT_DELTA_MAX_RATIO * len(text):
+                    db.execute(
+                        "INSERT INTO draft_deltas (hash, base, depth, delta) VALUES (?, ?, ?, ?)",
+                        (digest, base[len(DRAFT_REF_PREFIX):], based[1] + 1, delta),
+                    )
+                else:
+                    db.execute("INSERT INTO draft_blobs (hash, text) VALUES (?, ?)", (digest, text))
+                db.commit()
+        return DRAFT_REF_PREFIX + digest
+
+    def get(self, ref: str) -> Optional[str]:
+        """Return the text behind a reference; plain (legacy) texts are returned as-is."""
+        if not self.is_ref(ref):
+            return ref
+        with self._lock:
+            loaded = self._load(ref[len(DRAFT_REF_PREFIX):])
+        return loaded[0] if loaded else None
+
+    def resolve(self, refs: list) -> list:
+        return [self.get(ref) for ref in refs]
+
+    def referenced_hashes(self) -> set[str]:
+        with self._lock:
+            return {row[0] for row in self._db().execute(
+                "SELECT hash FROM draft_blobs UNION SELECT hash FROM draft_deltas")}
+
+    def with_bases(self, hashes: set[str]) -> set[str]:
+        """`hashes` plus every draft their deltas are based on, which must be kept with them."""
+        found, frontier = set(hashes), list(hashes)
+        with self._lock:
+            db = self._db()
+            while frontier:
+                row = db.execute("SELECT base FROM draft_deltas WHERE hash = ?", (frontier.pop(),)).fetchone()
+                if row and row[0] not in found:
+                    found.add(row[0])
+                    frontier.append(row[0])
+        return found
+
+    def delete(self, hashes: set[str]):
+        with self._lock:
+            db = self._db()
+            db.executemany("DELETE FROM draft_blobs WHERE hash = ?", [(h,) for h in hashes])
+            db.executemany("DELETE FROM draft_deltas WHERE hash = ?", [(h,) for h in hashes])
+            db.commit()
+
+
+draft_store = DraftStore()
+
+
+def hydrate_state(values: dict) -> dict:
+    """Replace draft references in a state dict with the draft texts for API responses."""
+    if not values or not values.get("previous_drafts"):
+        return values
+    return {**values, "previous_drafts": draft_store.resolve(values["previous_drafts"])}
@@ -0,0 +1,244 @@
+"""
+Deterministic stand-in for the LLM backend, for benchmarks and tests without a GPU.
+
+In-process: set LLM_PROVIDER=fake and `config.get_llm()` calls a FakeChatModel.
+Over HTTP:  python -m backend.fake_llm --port 11435, then point OLLAMA_BASE_URL at it.
+            It speaks enough of the Ollama API (/api/chat, /api/tags, /api/version)
+            for ChatOllama, so the real client, connection pool and HTTP path are exercised.
+
+Knobs (env, or CLI flags for the server):
+  FAKE_LLM_LATENCY_MS       time to first token (default 50)
+  FAKE_LLM_TOKENS_PER_SEC   generation speed, 0 = instant (default 200)
+  FAKE_LLM_DRAFT_TOKENS     words per generated draft (default 120)
+  FAKE_LLM_SAFETY_SCORES    comma-separated scores returned in turn (default "1.0")
+  FAKE_LLM_EMPATHY_SCORES   comma-separated scores returned in turn (default "4.0")
+  FAKE_LLM_ERROR_RATE       fraction of requests that fail (HTTP 500 / exception, default 0)
+  FAKE_LLM_STALL_RATE       fraction of requests whose first token is delayed by FAKE_LLM_STALL_MS
+  FAKE_LLM_STALL_MS         extra first-token delay of a stalled request (default 2000)
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+
+def _scores(env: str, default: str) -> list[float]:
+    return [float(s) for s in os.getenv(env, default).split(",") if s.strip()]
+
+
+class ScriptedResponder:
+    """Chooses a reply for a prompt: a draft, section edits, or a scripted safety/empathy/fused verdict."""
+
+    def __init__(self, safety_scores=None, empathy_scores=None, draft_tokens=None,
+                 error_rate=None, stall_rate=None, stall_ms=None):
+        self._safety = itertools.cycle(safety_scores or _scores("FAKE_LLM_SAFETY_SCORES", "1.0"))
+        self._empathy = itertools.cycle(empathy_scores or _scores("FAKE_LLM_EMPATHY_SCORES", "4.0"))
+        self.draft_tokens = draft_tokens or int(os.getenv("FAKE_LLM_DRAFT_TOKENS", "120"))
+        self.error_rate = float(os.getenv("FAKE_LLM_ERROR_RATE", "0")) if error_rate is None else error_rate
+        self.stall_rate = float(os.getenv("FAKE_LLM_STALL_RATE", "0")) if stall_rate is None else stall_rate
+        self.stall_ms = float(os.getenv("FAKE_LLM_STALL_MS", "2000")) if stall_ms is None else stall_ms
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def fault(self) -> tuple[bool, float]:
+        """Injected faults for one request: (fail it, extra first-token delay in ms)."""
+        failed = random.random() < self.error_rate
+        stall = self.stall_ms if random.random() < self.stall_rate else 0.0
+        return failed, stall
+
+    def reply(self, prompt: str) -> str:
+        with self._lock:
+            self.calls += 1
+            if "two axes" in prompt:
+                return json.dumps({
+                    "safety_score": next(self._safety), "safety_feedback": "No risky instructions found.",
+                    "empathy_score": next(self._empathy), "empathy_feedback": "Warm and validating tone.",
+                })
+            if "Current protocol, by section" in prompt:
+                last = max((int(n) for n in re.findall(r"^\[S(\d+)\]$", prompt, re.MULTILINE)), default=0)
+                return json.dumps({"edits": [{
+                    "section": f"S{last}", "action": "insert_after",
+                    "text": "If this feels like too much, take a break and reach out to your therapist.",
+                }]})
+            if "Clinical Safety Supervisor" in prompt:
+                return f"Score: {next(self._safety)}\nFeedback: No risky instructions found."
+            if "empathetic clinical supervisor" in prompt:
+                return f"Score: {next(self._empathy)}\nFeedback: Warm and validating tone."
+        words = ["Step", "1:", "Notice", "the", "anxious", "thought", "and", "write", "it", "down."]
+        return " ".join(itertools.islice(itertools.cycle(words), self.draft_tokens)).replace(" Step", "\nStep")
+
+
+def paced_tokens(text: str, latency_ms: float, tokens_per_sec: float) -> Iterator[str]:
+    """Yield whitespace tokens with the configured first-token latency and token rate."""
+    time.sleep(latency_ms / 1000)
+    for i, token in enumerate(text.split(" ")):
+        if tokens_per_sec and i:
+            time.sleep(1 / tokens_per_sec)
+        yield token if i == 0 else " " + token
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model returning scripted, paced responses. Thread-safe; one instance per process is enough."""
+
+    model: str = "fake"
+    base_url: str = "fake://local"
+    latency_ms: float = float(os.getenv("FAKE_LLM_LATENCY_MS", "50"))
+    tokens_per_sec: float = float(os.getenv("FAKE_LLM_TOKENS_PER_SEC", "200"))
+    _responder: ScriptedResponder = PrivateAttr(default_factory=ScriptedResponder)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    @property
+    def calls(self) -> int:
+        return self._responder.calls
+
+    def _usage(self, prompt: str, completion: str) -> dict:
+        input_tokens, output_tokens = len(prompt.split()), len(completion.split())
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+    def _latency(self) -> float:
+        failed, stall = self._responder.fault()
+        if failed:
+            time.sleep(self.latency_ms / 1000)
+            raise RuntimeError("fake LLM: injected failure")
+        return self.latency_ms + stall
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        prompt = "\n".join(str(m.content) for m in messages)
+        latency_ms = self._latency()
+        text = "".join(paced_tokens(self._responder.reply(prompt), latency_ms, self.tokens_per_sec))
+        message = AIMessage(content=text, usage_metadata=self._usage(prompt, text))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        prompt = "\n".join(str(m.content) for m in messages)
+        latency_ms = self._latency()
+        text = self._responder.reply(prompt)
+        for token in paced_tokens(text, latency_ms, self.tokens_per_sec):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(prompt, text)))
+
+
+# --- Ollama-compatible HTTP stand-in ---
+
+def make_handler(responder: ScriptedResponder, latency_ms: float, tokens_per_sec: float):
+    class OllamaHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real server
+
+        def log_message(self, format, *args):
+            pass
+
+        def _json(self, payload: dict, status: int = 200):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/api/version":
+                return self._json({"version": "0.0.0-fake"})
+            if self.path == "/api/tags":
+                return self._json({"models": [{"name": "fake", "model": "fake"}]})
+            self._json({"error": "not found"}, 404)
+
+        def do_HEAD(self):
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_POST(self):
+            if self.path != "/api/chat":
+                return self._json({"error": "not found"}, 404)
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            failed, stall = responder.fault()
+            if failed:
+                time.sleep(latency_ms / 1000)
+                return self._json({"error": "injected failure"}, 500)
+            first_token_ms = latency_ms + stall
+            prompt = "\n".join(m.get("content", "") for m in request.get("messages", []))
+            model = request.get("model", "fake")
+            text = responder.reply(prompt)
+            usage = {"prompt_eval_count": len(prompt.split()), "eval_count": len(text.split())}
+
+            def message(content: str, done: bool) -> dict:
+                payload = {
+                    "model": model,
+                    "created_at": datetime.now(timezone.utc).isoformat(),
+                    "message": {"role": "assistant", "content": content},
+                    "done": done,
+                }
+                if done:
+                    payload.update(done_reason="stop", **usage)
+                return payload
+
+            if not request.get("stream", True):
+                content = "".join(paced_tokens(text, first_token_ms, tokens_per_sec))
+                return self._json(message(content, True))
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for token in paced_tokens(text, first_token_ms, tokens_per_sec):
+                    self._chunk(json.dumps(message(token, False)) + "\n")
+                self._chunk(json.dumps(message("", True)) + "\n")
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # client cancelled the stream
+
+        def _chunk(self, data: str):
+            raw = data.encode()
+            self.wfile.write(f"{len(raw):X}\r\n".encode() + raw + b"\r\n")
+            self.wfile.flush()
+
+    return OllamaHandler
+
+
+def serve(host: str = "127.0.0.1", port: int = 11435, latency_ms: float = 50, tokens_per_sec: float = 200,
+          responder: ScriptedResponder = None) -> ThreadingHTTPServer:
+    """Start the stand-in server on a background thread and return it (call .shutdown() to stop)."""
+    server = ThreadingHTTPServer((host, port), make_handler(responder or ScriptedResponder(), latency_ms, tokens_per_sec))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ollama-compatible fake LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency-ms", type=float, default=float(os.getenv("FAKE_LLM_LATENCY_MS", "50")))
+    parser.add_argument("--tokens-per-sec", type=float, default=float(os.getenv("FAKE_LLM_TOKENS_PER_SEC", "200")))
+    parser.add_argument("--error-rate", type=float, default=None, help="fraction of requests answered with HTTP 500")
+    parser.add_argument("--stall-rate", type=float, default=None, help="fraction of requests with a delayed first token")
+    parser.add_argument("--stall-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    responder = ScriptedResponder(error_rate=args.error_rate, stall_rate=args.stall_rate, stall_ms=args.stall_ms)
+    server = serve(args.host, args.port, args.latency_ms, args.tokens_per_sec, responder)
+    print(f"Fake Ollama listening on http://{args.host}:{args.port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,72 +1,176 @@
-import sqlite3
-from langgraph.checkpoint.sqlite import SqliteSaver
-from langgraph.graph import StateGraph, END
+"""
+The protocol workflow. The graph is compiled, and its checkpointer opened, on first use:
+call `get_graph()` (or import `graph`, which calls it), so importing this module, and the
+API or MCP server on top of it, does not pay for LangGraph and the agent modules.
+"""
+import os
+import sys
+import threading
+import time
+
 from backend.state import ProtocolState
-from backend.agents.drafter import draft_protocol
-from backend.agents.safety import review_safety
-from backend.agents.empathy import critique_empathy
-from backend.agents.supervisor import supervisor_node
+from backend.agents.supervisor import decide, policy_for
+from backend.config import run_metadata
+from backend.metrics import record_decision, thread_usage
+
+# How the draft is critiqued each iteration:
+# - "parallel":      safety and empathy as two graph nodes, always both awaited
+# - "short_circuit": one node that cancels the empathy call once safety decides the outcome
+# - "fused":         one node that scores safety and empathy in a single LLM request
+CRITIC_MODE = os.getenv("CRITIC_MODE", "parallel")
+# Build the graph on a background thread at server startup instead of on the first request.
+GRAPH_PRELOAD = os.getenv("GRAPH_PRELOAD", "true").lower() in ("1", "true", "yes")
 
-# Pass-through nodes. Returns partial update.
 def supervisor_step(state: ProtocolState) -> dict:
-    return {} # No state update, just routing
+    """
+    Add this iteration's scores and usage to the thread, then decide under its policy.
+    Routing follows `last_decision`. The decision is recorded here, once: the routing
+    function also runs whenever a state update is applied as the supervisor (resume, seeding).
+    """
+    thread_id = run_metadata().get("thread_id")
+    tokens, seconds = thread_usage.take(thread_id)
+    # Scores a critic did not report this round (short-circuit mode) are logged as None
+    unscored = {key: None for key in state.get("unscored") or []}
+    entry = {
+        "iteration": state.get("iteration_count", 0),
+        "safety_score": state.get("safety_score"),
+        "empathy_score": state.get("empathy_score"),
+        **unscored,
+    }
+    updates = {
+        "score_history": [entry],
+        "tokens_used": state.get("tokens_used", 0) + tokens,
+        "elapsed_s": round(state.get("elapsed_s", 0.0) + seconds, 3),
+    }
+    policy = policy_for(state)
+    current = {**state, **updates, "score_history": [*state.get("score_history", []), entry]}
+    decision, reason = decide(current, policy)
+    updates["last_decision"] = {"decision": decision, "reason": reason, "policy": policy.name}
+    record_decision(decision, {**current, **unscored, "last_decision": updates["last_decision"]}, thread_id)
+    return updates
 
 def human_review_step(state: ProtocolState) -> dict:
     if state.get("human_action") == "revise":
         return {"status": "reviewing"}
     return {"status": "approved"}
 
-# 1. Initialize Graph
-workflow = StateGraph(ProtocolState)
-
-# 2. Add Nodes
-workflow.add_node("drafter", draft_protocol)
-workflow.add_node("safety", review_safety)
-workflow.add_node("empathy", critique_empathy)
-workflow.add_node("supervisor", supervisor_step)
-workflow.add_node("human_review", human_review_step)
-
-# 3. Define Entry
-workflow.set_entry_point("drafter")
-
-# 4. Define Edges
-workflow.add_edge("drafter", "safety")
-workflow.add_edge("drafter", "empathy")
-workflow.add_edge("safety", "supervisor")
-workflow.add_edge("empathy", "supervisor")
-
-# 5. Conditional Logic
-workflow.add_conditional_edges(
-    "supervisor",
-    supervisor_node,
-    {
-        "revise": "drafter",
-        "halt": "human_review",   # Pause for human
-        "approve": "human_review" # Auto-approve but still require human sign-off
-    }
-)
+def route_supervisor(state: ProtocolState):
+    # Also runs for state updates applied as the supervisor; threads checkpointed before
+    # decisions were stored have no `last_decision`
+    return (state.get("last_decision") or {}).get("decision") or decide(state)[0]
 
 def route_human_decision(state: ProtocolState):
     if state.get("human_action") == "revise":
         return "revise"
     return "approve"
 
-# Route based on human decision
-workflow.add_conditional_edges(
-    "human_review",
-    route_human_decision,
-    {
-        "revise": "drafter",
-        "approve": END
-    }
-)
 
-# 6. Checkpointing Setup
-conn = sqlite3.connect("checkpoints.sqlite", check_same_thread=False)
-memory = SqliteSaver(conn)
+def build_workflow():
+    """Assemble the (uncompiled) workflow for the configured critic and drafting modes."""
+    from langgraph.graph import StateGraph, END
+    from backend.agents.drafter import draft_protocol
+    from backend.agents.safety import review_safety
+    from backend.agents.empathy import critique_empathy
+    from backend.agents.critics import review_critics
+    from backend.agents.fused import critique_fused
+    from backend.agents.speculative import draft_best_of_n, DRAFT_CANDIDATES
+    from backend.metrics import instrument_node
+
+    # With DRAFT_CANDIDATES > 1 the drafter writes and critiques K candidates itself and
+    # hands the best one straight to the supervisor (no separate critic nodes).
+    speculative = DRAFT_CANDIDATES > 1
+
+    # 1. Initialize Graph
+    workflow = StateGraph(ProtocolState)
+
+    # 2. Add Nodes
+    # Every node is wrapped to record wall time per node and per thread (see /metrics)
+    if speculative:
+        # Candidates are critiqued inside the drafter node
+        workflow.add_node("drafter", instrument_node("drafter", draft_best_of_n))
+    else:
+        workflow.add_node("drafter", instrument_node("drafter", draft_protocol))
+        if CRITIC_MODE == "short_circuit":
+            workflow.add_node("critics", instrument_node("critics", review_critics))
+        elif CRITIC_MODE == "fused":
+            workflow.add_node("critics", instrument_node("critics", critique_fused))
+        else:
+            workflow.add_node("safety", instrument_node("safety", review_safety))
+            workflow.add_node("empathy", instrument_node("empathy", critique_empathy))
+    workflow.add_node("supervisor", instrument_node("supervisor", supervisor_step))
+    workflow.add_node("human_review", instrument_node("human_review", human_review_step))
+
+    # 3. Define Entry
+    workflow.set_entry_point("drafter")
+
+    # 4. Define Edges
+    if speculative:
+        workflow.add_edge("drafter", "supervisor")
+    elif CRITIC_MODE in ("short_circuit", "fused"):
+        workflow.add_edge("drafter", "critics")
+        workflow.add_edge("critics", "supervisor")
+    else:
+        workflow.add_edge("drafter", "safety")
+        workflow.add_edge("drafter", "empathy")
+        workflow.add_edge("safety", "supervisor")
+        workflow.add_edge("empathy", "supervisor")
+
+    # 5. Conditional Logic
+    workflow.add_conditional_edges(
+        "supervisor",
+        route_supervisor,
+        {
+            "revise": "drafter",
+            "halt": "human_review",   # Pause for human
+            "approve": "human_review" # Auto-approve but still require human sign-off
+        }
+    )
+
+    # Route based on human decision
+    workflow.add_conditional_edges(
+        "human_review",
+        route_human_decision,
+        {
+            "revise": "drafter",
+            "approve": END
+        }
+    )
+
+    return workflow
+
+
+_graph = None
+_graph_lock = threading.Lock()
+
+
+def get_graph():
+    """The compiled graph (with its checkpointer), built once per process on first use."""
+    global _graph
+    if _graph is None:
+        with _graph_lock:
+            if _graph is None:
+                from backend.checkpointing import create_checkpointer
+
+                started = time.perf_counter()
+                # Compile with Interrupt
+                _graph = build_workflow().compile(
+                    checkpointer=create_checkpointer(),
+                    interrupt_before=["human_review"]
+                )
+                print(f"--- [Graph] Compiled in {time.perf_counter() - started:.2f}s ---", file=sys.stderr)
+    return _graph
+
+
+def preload_graph():
+    """Start building the graph in the background (GRAPH_PRELOAD), so startup is not blocked."""
+    if GRAPH_PRELOAD and _graph is None:
+        threading.Thread(target=get_graph, daemon=True, name="graph-preload").start()
+
 
-# 7. Compile with Interrupt
-graph = workflow.compile(
-    checkpointer=memory,
-    interrupt_before=["human_review"]
-)
+def __getattr__(name: str):
+    # `from backend.graph import graph` keeps working, building the graph on that access
+    if name == "graph":
+        return get_graph()
+    if name == "memory":
+        return get_graph().checkpointer
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,81 @@
+"""
+Import-time budget for the entry points that start cold: autoscaled API workers and
+the MCP server, which is spawned per client session.
+
+    python -m backend.importtime            # exit status 1 when over budget
+    python -m backend.importtime --top 15   # also list the slowest imports
+
+Each entry point is imported in a fresh interpreter with `python -X importtime`
+(best of --runs). Importing one must also not load the modules that are deferred until
+the graph is first used (LangGraph's graph builder, the checkpointer, LLM clients, agents).
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+# Milliseconds each entry point may take to import (cumulative, as reported by -X importtime).
+IMPORT_BUDGET_MS = {
+    "backend.app": float(os.getenv("IMPORT_BUDGET_APP_MS", "1000")),
+    "backend.mcp_server": float(os.getenv("IMPORT_BUDGET_MCP_MS", "1500")),
+}
+
+# Loaded by `get_graph()` / the first LLM call, never by importing an entry point.
+DEFERRED_MODULES = (
+    "langgraph.graph",
+    "langgraph.checkpoint.sqlite",
+    "langchain_core.language_models",
+    "langchain_ollama",
+    "langchain_openai",
+    "backend.checkpointing",
+    "backend.agents.drafter",
+    "backend.resilience",
+)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(module: str) -> tuple[float, list[tuple[float, str]], list[str]]:
+    """(total ms, [(cumulative ms, module)] of every import, deferred modules loaded)."""
+    probe = f"import sys, {module}; print(','.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe],
+        cwd=ROOT, capture_output=True, text=True, env={**os.environ, "PYTHONPATH": ROOT},
+    )
+    if result.returncode:
+        raise RuntimeError(f"importing {module} failed:\n{result.stderr[-2000:]}")
+
+    imports, total = [], 0.0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        imports.append((int(cumulative) / 1000, name.strip()))
+        if name.strip() == module:
+            total = int(cumulative) / 1000
+    loaded = [m for m in result.stdout.strip().split(",") if m]
+    return total, sorted(imports, reverse=True), loaded
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Check the import-time budget of the entry points")
+    parser.add_argument("--runs", type=int, default=3, help="fresh imports per module; the fastest counts")
+    parser.add_argument("--top", type=int, default=0, help="list the N slowest imports of each module")
+    args = parser.parse_args()
+
+    failed = False
+    for module, budget in IMPORT_BUDGET_MS.items():
+        runs = [measure(module) for _ in range(max(args.runs, 1))]
+        total, imports, loaded = min(runs, key=lambda run: run[0])
+        over = total > budget
+        failed |= over or bool(loaded)
+        print(f"{module:<20} {total:8.1f} ms  (budget {budget:.0f} ms){'  OVER BUDGET' if over else ''}")
+        if loaded:
+            print(f"  imports deferred modules: {', '.join(loaded)}")
+        for cumulative, name in imports[1:args.top + 1]:
+            print(f"  {cumulative:8.1f} ms  {name}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
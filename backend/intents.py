@@ -0,0 +1,211 @@
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Optional
+
+INTENT_CACHE_ENABLED = os.getenv("INTENT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+INTENT_CACHE_PATH = os.getenv("INTENT_CACHE_PATH", "intent_cache.sqlite")
+INTENT_CACHE_MAX_ENTRIES = int(os.getenv("INTENT_CACHE_MAX_ENTRIES", "1000"))
+# Freshness: approved drafts older than this are not reused.
+INTENT_CACHE_TTL_SECONDS = float(os.getenv("INTENT_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+# Also reuse drafts of near-duplicate intents (off by default). Character similarity cannot tell
+# "with suicidal thoughts" from "without suicidal thoughts", or an adult from a child, so only
+# enable it where a human reviews every seeded draft with that in mind.
+INTENT_NEAR_DUPLICATES = os.getenv("INTENT_NEAR_DUPLICATES", "false").lower() in ("1", "true", "yes")
+# Estimated Jaccard similarity (character shingles) above which two intents count as the same request.
+INTENT_SIMILARITY = float(os.getenv("INTENT_SIMILARITY", "0.85"))
+
+SHINGLE_SIZE = 4
+MINHASH_PERMUTATIONS = 64
+# LSH banding: signatures sharing all rows of any band are candidates for the similarity check.
+MINHASH_BANDS = 16
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(20240601)  # fixed seed: signatures must be stable across processes
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(_MERSENNE_PRIME))
+                 for _ in range(MINHASH_PERMUTATIONS)]
+
+_NON_WORD = re.compile(r"[^\w]+")
+_FILLER = {"a", "an", "the", "please", "me", "some"}
+
+
+def normalize_intent(intent: str) -> str:
+    """Case-, accent-, punctuation- and whitespace-insensitive form of an intent."""
+    text = unicodedata.normalize("NFKC", intent).casefold()
+    return " ".join(word for word in _NON_WORD.sub(" ", text).split() if word not in _FILLER)
+
+
+def shingles(normalized: str, size: int = SHINGLE_SIZE) -> set[str]:
+    padded = f" {normalized} "
+    return {padded[i:i + size] for i in range(max(len(padded) - size + 1, 1))}
+
+
+def minhash(normalized: str) -> list[int]:
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+              for s in shingles(normalized)]
+    return [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def similarity(a: list[int], b: list[int]) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+def bands(signature: list[int]) -> list[str]:
+    rows = len(signature) // MINHASH_BANDS
+    return [
+        f"{i}:" + hashlib.blake2b(json.dumps(signature[i * rows:(i + 1) * rows]).encode(), digest_size=8).hexdigest()
+        for i in range(MINHASH_BANDS)
+    ]
+
+
+class IntentCache:
+    """
+    Approved drafts by intent, for seeding new threads that ask for the same thing.
+
+    Lookups match the normalized text and, with INTENT_NEAR_DUPLICATES, near-duplicates via
+    MinHash/LSH over character shingles. Entries are scoped to the drafter model that wrote them, expire
+    after INTENT_CACHE_TTL_SECONDS and are evicted LRU beyond INTENT_CACHE_MAX_ENTRIES.
+    """
+
+    def __init__(self, path: str = INTENT_CACHE_PATH, max_entries: int = INTENT_CACHE_MAX_ENTRIES,
+                 ttl_seconds: float = INTENT_CACHE_TTL_SECONDS, threshold: float = INTENT_SIMILARITY,
+                 enabled: bool = INTENT_CACHE_ENABLED, near_duplicates: bool = INTENT_NEAR_DUPLICATES):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self.enabled = enabled
+        self.near_duplicates = near_duplicates
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @staticmethod
+    def key(model: str, normalized: str) -> str:
+        return hashlib.sha256(f"{model}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.executescript(
+                """
+                PRAGMA journal_mode=WAL;
+                CREATE TABLE IF NOT EXISTS intents (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    normalized TEXT NOT NULL,
+                    signature TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS intents_last_used ON intents (last_used);
+                CREATE TABLE IF NOT EXISTS intent_bands (
+                    band TEXT NOT NULL,
+                    key TEXT NOT NULL REFERENCES intents (key) ON DELETE CASCADE
+                );
+                CREATE INDEX IF NOT EXISTS intent_bands_band ON intent_bands (band);
+                CREATE INDEX IF NOT EXISTS intent_bands_key ON intent_bands (key);
+                PRAGMA foreign_keys=ON;
+                """
+            )
+        return self._conn
+
+    def get(self, intent: str, model: str) -> Optional[dict]:
+        """Return the cached value for an identical (or, if enabled, near-duplicate) intent, if fresh."""
+        if not self.enabled:
+            return None
+        normalized = normalize_intent(intent)
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            self.evictions += db.execute("DELETE FROM intents WHERE created_at < ?", (now - self.ttl_seconds,)).rowcount
+
+            key = self.key(model, normalized)
+            row = db.execute("SELECT key, value FROM intents WHERE key = ?", (key,)).fetchone()
+            if row:
+                self.exact_hits += 1
+            elif not self.near_duplicates:
+                self.misses += 1
+            else:
+                signature = minhash(normalized)
+                band_keys = bands(signature)
+                candidates = db.execute(
+                    f"""
+                    SELECT i.key, i.value, i.signature FROM intents i
+                    WHERE i.model = ? AND i.key IN (
+                        SELECT key FROM intent_bands WHERE band IN ({",".join("?" * len(band_keys))})
+                    )
+                    """,
+                    (model, *band_keys),
+                ).fetchall()
+                scored = [(similarity(signature, json.loads(sig)), k, value) for k, value, sig in candidates]
+                best = max(scored, default=None)
+                if best and best[0] >= self.threshold:
+                    row = best[1], best[2]
+                    self.near_hits += 1
+                else:
+                    self.misses += 1
+
+            if row:
+                db.execute("UPDATE intents SET last_used = ? WHERE key = ?", (now, row[0]))
+            db.commit()
+        return json.loads(row[1]) if row else None
+
+    def set(self, intent: str, model: str, value: dict):
+        if not self.enabled:
+            return
+        normalized = normalize_intent(intent)
+        signature = minhash(normalized)
+        key = self.key(model, normalized)
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute("DELETE FROM intents WHERE key = ?", (key,))
+            db.execute(
+                "INSERT INTO intents (key, model, normalized, signature, value, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, normalized, json.dumps(signature), json.dumps(value), now, now),
+            )
+            db.executemany("INSERT INTO intent_bands (band, key) VALUES (?, ?)", [(b, key) for b in bands(signature)])
+            count = db.execute("SELECT COUNT(*) FROM intents").fetchone()[0]
+            if count > self.max_entries:
+                overflow = count - self.max_entries
+                db.execute(
+                    "DELETE FROM intents WHERE key IN (SELECT key FROM intents ORDER BY last_used LIMIT ?)",
+                    (overflow,),
+                )
+                self.evictions += overflow
+            db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db().execute("DELETE FROM intents")
+            self._db().commit()
+
+    @property
+    def hits(self) -> int:
+        return self.exact_hits + self.near_hits
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "exact_hits": self.exact_hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+intent_cache = IntentCache()
@@ -0,0 +1,159 @@
+import asyncio
+import math
+import os
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Literal, Optional
+
+from backend import runtime
+
+# Number of workers draining the job queue. Each worker drives one graph run at a time,
+# so there is no point in having more workers than the run executor has threads.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", str(runtime.GRAPH_CONCURRENCY)))
+# Admission limit: jobs waiting (not yet running) beyond this are rejected with 429.
+JOB_QUEUE_MAX = int(os.getenv("JOB_QUEUE_MAX", "100"))
+# How many finished job records to remember for status lookups.
+JOB_HISTORY_MAX = int(os.getenv("JOB_HISTORY_MAX", "1000"))
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue is at its admission limit."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Job queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class JobConflictError(Exception):
+    """Raised when a thread already has a queued or running job."""
+
+
+@dataclass
+class Job:
+    thread_id: str
+    input: Any
+    # State update applied just before the run (a resume's human edits), so a rejected
+    # submission leaves the thread untouched
+    updates: Optional[dict] = None
+    status: Literal["queued", "running", "done", "failed"] = "queued"
+    error: Optional[str] = None
+    enqueued_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "running")
+
+
+class JobQueue:
+    """
+    In-process FIFO of graph runs served by a fixed pool of asyncio workers.
+
+    Workers hand the actual `graph.invoke` to the bounded run executor in
+    `backend.runtime`, so the event loop only schedules and tracks jobs.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, max_depth: int = JOB_QUEUE_MAX):
+        self.workers = workers
+        self.max_depth = max_depth
+        self._pending: list[str] = []  # thread_ids in queue order
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._wakeup: Optional[asyncio.Queue] = None
+        self._tasks: list[asyncio.Task] = []
+        self._avg_duration = 30.0  # seconds, refined as jobs finish
+
+    async def start(self):
+        self._wakeup = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    @property
+    def depth(self) -> int:
+        return len(self._pending)
+
+    @property
+    def running(self) -> int:
+        return sum(1 for job in self._jobs.values() if job.status == "running")
+
+    def retry_after(self) -> int:
+        """Rough seconds until a queue slot frees up (one running job finishing)."""
+        return max(1, math.ceil(self._avg_duration / max(self.workers, 1)))
+
+    def submit(self, thread_id: str, input: Any, updates: Optional[dict] = None) -> Job:
+        existing = self._jobs.get(thread_id)
+        if existing and existing.active:
+            raise JobConflictError(f"Thread {thread_id} already has a {existing.status} job")
+        if self.depth >= self.max_depth:
+            raise QueueFullError(self.retry_after())
+
+        job = Job(thread_id=thread_id, input=input, updates=updates)
+        self._remember(job)
+        self._pending.append(thread_id)
+        self._wakeup.put_nowait(thread_id)
+        return job
+
+    def get(self, thread_id: str) -> Optional[Job]:
+        return self._jobs.get(thread_id)
+
+    def position(self, thread_id: str) -> Optional[int]:
+        """1-based position in the queue, or None if the job is not waiting."""
+        try:
+            return self._pending.index(thread_id) + 1
+        except ValueError:
+            return None
+
+    def describe(self, thread_id: str) -> Optional[dict]:
+        job = self._jobs.get(thread_id)
+        if not job:
+            return None
+        return {
+            "status": job.status,
+            "position": self.position(thread_id),
+            "queue_depth": self.depth,
+            "enqueued_at": job.enqueued_at,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+            "error": job.error,
+        }
+
+    def _remember(self, job: Job):
+        self._jobs[job.thread_id] = job
+        self._jobs.move_to_end(job.thread_id)
+        while len(self._jobs) > JOB_HISTORY_MAX:
+            oldest_id, oldest = next(iter(self._jobs.items()))
+            if oldest.active:
+                break
+            del self._jobs[oldest_id]
+
+    async def _worker(self, index: int):
+        while True:
+            thread_id = await self._wakeup.get()
+            self._pending.remove(thread_id)
+            job = self._jobs[thread_id]
+            job.status = "running"
+            job.started_at = time.time()
+            config = {"configurable": {"thread_id": thread_id}}
+            try:
+                if job.updates is not None:
+                    await runtime.update_state(config, job.updates)
+                await runtime.run_graph(job.input, config)
+                job.status = "done"
+            except Exception as e:
+                print(f"--- [Jobs] Worker {index} failed thread {thread_id}: {e} ---", file=sys.stderr)
+                job.status = "failed"
+                job.error = str(e)
+            finally:
+                job.finished_at = time.time()
+                # Exponential moving average keeps Retry-After estimates current.
+                self._avg_duration = 0.8 * self._avg_duration + 0.2 * (job.finished_at - job.started_at)
+
+
+job_queue = JobQueue()
@@ -0,0 +1,218 @@
+"""
+Checkpoint store maintenance.
+
+    python -m backend.maintenance stats
+    python -m backend.maintenance prune --keep 2
+    python -m backend.maintenance retain --days 30
+    python -m backend.maintenance gc-drafts
+    python -m backend.maintenance vacuum
+    python -m backend.maintenance reindex      # rebuild the thread listing/search index
+    python -m backend.maintenance compact      # all of the above, in order
+
+With CHECKPOINT_BACKEND=postgres only `retain`, `gc-drafts` and `reindex` apply; the others
+work on the SQLite file.
+"""
+import argparse
+import os
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from backend.checkpointing import CHECKPOINT_BACKEND
+from backend.config import CHECKPOINT_DB
+from backend.drafts import draft_store
+from backend.thread_index import thread_index
+
+# Checkpoints kept per thread by `prune`. The latest one is all `get_state`/resume need;
+# one extra keeps the previous step around for debugging.
+CHECKPOINT_KEEP_PER_THREAD = int(os.getenv("CHECKPOINT_KEEP_PER_THREAD", "2"))
+# Completed threads untouched for this many days are deleted by `retain`.
+CHECKPOINT_RETENTION_DAYS = float(os.getenv("CHECKPOINT_RETENTION_DAYS", "30"))
+
+# Commands that run SQL against the SQLite checkpoint file
+SQLITE_ONLY_COMMANDS = ("stats", "prune", "vacuum", "compact")
+
+
+def connect(path: str = CHECKPOINT_DB) -> sqlite3.Connection:
+    return sqlite3.connect(path)
+
+
+def file_sizes(path: str = CHECKPOINT_DB) -> dict:
+    return {
+        name: os.path.getsize(path + suffix) if os.path.exists(path + suffix) else 0
+        for name, suffix in (("db", ""), ("wal", "-wal"), ("shm", "-shm"))
+    }
+
+
+def stats(conn: sqlite3.Connection) -> dict:
+    def count(sql: str) -> int:
+        try:
+            return conn.execute(sql).fetchone()[0]
+        except sqlite3.OperationalError:  # table not created yet
+            return 0
+
+    return {
+        "threads": count("SELECT COUNT(DISTINCT thread_id) FROM checkpoints"),
+        "checkpoints": count("SELECT COUNT(*) FROM checkpoints"),
+        "writes": count("SELECT COUNT(*) FROM writes"),
+        "draft_blobs": count("SELECT COUNT(*) FROM draft_blobs"),
+        "draft_deltas": count("SELECT COUNT(*) FROM draft_deltas"),
+        "indexed_threads": count("SELECT COUNT(*) FROM threads"),
+        "bytes": file_sizes(),
+    }
+
+
+def prune_superseded(conn: sqlite3.Connection, keep: int = CHECKPOINT_KEEP_PER_THREAD) -> int:
+    """Delete all but the newest `keep` checkpoints of every thread, plus their writes."""
+    keep = max(keep, 1)
+    # checkpoint ids are time-ordered (uuid6), so ordering by id orders by age
+    deleted = conn.execute(
+        """
+        DELETE FROM checkpoints WHERE rowid IN (
+            SELECT rowid FROM (
+                SELECT rowid, ROW_NUMBER() OVER (
+                    PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC
+                ) AS rn
+                FROM checkpoints
+            ) WHERE rn > ?
+        )
+        """,
+        (keep,),
+    ).rowcount
+    conn.execute(
+        """
+        DELETE FROM writes WHERE NOT EXISTS (
+            SELECT 1 FROM checkpoints c
+            WHERE c.thread_id = writes.thread_id
+              AND c.checkpoint_ns = writes.checkpoint_ns
+              AND c.checkpoint_id = writes.checkpoint_id
+        )
+        """
+    )
+    conn.commit()
+    return deleted
+
+
+def thread_ids(saver) -> list[str]:
+    """Ids of every thread in the checkpoint store."""
+    query = "SELECT DISTINCT thread_id FROM checkpoints"
+    if isinstance(saver, SqliteSaver):
+        with saver.cursor(transaction=False) as cur:
+            return [row[0] for row in cur.execute(query)]
+    # PostgresSaver on the psycopg pool built in backend.checkpointing (dict rows)
+    with saver.conn.connection() as conn:
+        return [row["thread_id"] for row in conn.execute(query)]
+
+
+def apply_retention(days: float = CHECKPOINT_RETENTION_DAYS) -> list[str]:
+    """Delete completed threads whose latest checkpoint is older than `days`."""
+    from backend.graph import get_graph
+
+    graph = get_graph()
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    saver = graph.checkpointer
+
+    removed = []
+    for thread_id in thread_ids(saver):
+        config = {"configurable": {"thread_id": thread_id}}
+        checkpoint = saver.get_tuple(config)
+        if not checkpoint or datetime.fromisoformat(checkpoint.checkpoint["ts"]) > cutoff:
+            continue
+        if graph.get_state(config).next:
+            continue  # still waiting for human review
+        saver.delete_thread(thread_id)
+        removed.append(thread_id)
+    thread_index.delete(removed)
+    return removed
+
+
+def draft_hashes(checkpoint) -> set[str]:
+    """Draft store hashes referenced by a checkpoint tuple's state and pending writes."""
+    refs = list(checkpoint.checkpoint["channel_values"].get("previous_drafts", []))
+    refs += [value for _, channel, values in checkpoint.pending_writes or []
+             if channel == "previous_drafts" for value in values]
+    return {ref.split(":")[-1] for ref in refs if draft_store.is_ref(ref)}
+
+
+def collect_draft_garbage() -> int:
+    """
+    Delete draft blobs no longer referenced by any checkpoint or pending write
+    (directly or as the base of a referenced delta).
+    A drafter node that is mid-write is not visible yet, so run this while no graph is running.
+    """
+    from backend.graph import get_graph
+
+    graph = get_graph()
+    live = set()
+    for checkpoint in graph.checkpointer.list(None):
+        live.update(draft_hashes(checkpoint))
+
+    orphans = draft_store.referenced_hashes() - draft_store.with_bases(live)
+    draft_store.delete(orphans)
+    return len(orphans)
+
+
+def reindex() -> int:
+    """Rebuild the thread index (GET /threads) from every thread in the checkpoint store."""
+    from backend.graph import get_graph
+
+    graph = get_graph()
+    saver = graph.checkpointer
+
+    threads = thread_ids(saver)
+    for thread_id in threads:
+        config = {"configurable": {"thread_id": thread_id}}
+        snapshot = graph.get_state(config)
+        first = None
+        for checkpoint in saver.list(config):  # newest first
+            first = checkpoint
+        created_at = datetime.fromisoformat(first.checkpoint["ts"]).timestamp() if first else None
+        thread_index.record(thread_id, snapshot.values, snapshot.next, created_at)
+    return len(threads)
+
+
+def vacuum(conn: sqlite3.Connection):
+    """Fold the WAL back into the database and reclaim free pages."""
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.execute("VACUUM")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checkpoint store maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats")
+    prune = sub.add_parser("prune")
+    prune.add_argument("--keep", type=int, default=CHECKPOINT_KEEP_PER_THREAD)
+    retain = sub.add_parser("retain")
+    retain.add_argument("--days", type=float, default=CHECKPOINT_RETENTION_DAYS)
+    sub.add_parser("gc-drafts")
+    sub.add_parser("vacuum")
+    sub.add_parser("reindex")
+    compact = sub.add_parser("compact")
+    compact.add_argument("--keep", type=int, default=CHECKPOINT_KEEP_PER_THREAD)
+    compact.add_argument("--days", type=float, default=CHECKPOINT_RETENTION_DAYS)
+    args = parser.parse_args()
+    sqlite = CHECKPOINT_BACKEND != "postgres"
+    if not sqlite and args.command in SQLITE_ONLY_COMMANDS:
+        parser.error(f"'{args.command}' works on SQLite checkpoint stores only (CHECKPOINT_BACKEND={CHECKPOINT_BACKEND}); "
+                     "use retain, gc-drafts or reindex, and the database's own maintenance (VACUUM) on Postgres")
+
+    conn = connect()
+    if args.command in ("retain", "compact"):
+        print(f"Deleted {len(apply_retention(args.days))} expired threads")
+    if args.command in ("prune", "compact"):
+        print(f"Pruned {prune_superseded(conn, args.keep)} superseded checkpoints")
+    if args.command in ("gc-drafts", "compact"):
+        print(f"Deleted {collect_draft_garbage()} orphaned draft blobs")
+    if args.command == "reindex":
+        print(f"Indexed {reindex()} threads")
+    if args.command in ("vacuum", "compact"):
+        vacuum(conn)
+        print("Vacuumed")
+    if sqlite:
+        print(stats(conn))
+
+
+if __name__ == "__main__":
+    main()
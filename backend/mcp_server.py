@@ -25,10 +25,68 @@ if sys.platform == "win32":
     sys.stdout.reconfigure(encoding='utf-8')
     sys.stderr.reconfigure(encoding='utf-8')
 
-from backend.graph import graph
+from backend import runtime
+from backend.batch import run_batch, BATCH_MAX_INTENTS
+from backend.streaming import event_bus
+from backend.graph import preload_graph
+
+# Maximum tool calls running graph work at once; further calls wait for a slot while
+# list_tools and other cheap requests keep being served.
+MCP_CONCURRENCY = int(os.getenv("MCP_CONCURRENCY", "4"))
+tool_slots = asyncio.Semaphore(MCP_CONCURRENCY)
 
 app = Server("flowstate")
 
+def progress_context():
+    """Request context and progress token of the current tool call (token is None if not requested)."""
+    try:
+        ctx = app.request_context
+    except LookupError:  # called outside an MCP request (e.g. benchmarks)
+        return None, None
+    return ctx, ctx.meta.progressToken if ctx.meta else None
+
+async def run_with_progress(input, config: dict) -> dict:
+    """
+    Run the graph off the event loop, sending an MCP progress notification each time a
+    node finishes (when the client asked for progress). If the client cancels the tool
+    call, this task is cancelled and the underlying run stops at its next step.
+    """
+    ctx, progress_token = progress_context()
+    if progress_token is None:
+        return await runtime.run_graph(input, config)
+
+    thread_id = config["configurable"]["thread_id"]
+    queue, _ = event_bus.subscribe(thread_id, require_active=False)
+    run = asyncio.create_task(runtime.run_graph(input, config))
+    completed_nodes = 0
+
+    async def report(event: dict):
+        nonlocal completed_nodes
+        if event["event"] == "node_end":
+            completed_nodes += 1
+            await ctx.session.send_progress_notification(
+                progress_token,
+                completed_nodes,
+                message=f"{event['node']} finished",
+                related_request_id=ctx.request_id,
+            )
+
+    try:
+        while not run.done():
+            next_event = asyncio.ensure_future(queue.get())
+            await asyncio.wait({run, next_event}, return_when=asyncio.FIRST_COMPLETED)
+            if next_event.done():
+                await report(next_event.result())
+            else:
+                next_event.cancel()
+        # Events published just before the run finished are already queued
+        while not queue.empty():
+            await report(queue.get_nowait())
+        return run.result()
+    finally:
+        run.cancel()
+        event_bus.unsubscribe(thread_id, queue)
+
 @app.list_tools()
 async def list_tools() -> list[types.Tool]:
     return [
@@ -43,6 +101,22 @@ async def list_tools() -> list[types.Tool]:
                 "required": ["intent"],
             },
         ),
+        types.Tool(
+            name="generate_protocols",
+            description="Generate protocols for several intents at once. Runs them concurrently and reports each as it finishes.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "intents": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "maxItems": BATCH_MAX_INTENTS,
+                        "description": "The clinical intents, one protocol thread each"
+                    },
+                },
+                "required": ["intents"],
+            },
+        ),
         types.Tool(
             name="review_protocol",
             description="Submit a human review decision (approve/revise) for a paused protocol thread.",
@@ -68,9 +142,10 @@ async def call_tool(name: str, arguments: dict) -> list[types.TextContent | type
         
         # Invoke graph
         # We run the graph until it either finishes or hits the human review interrupt
-        result = graph.invoke(initial_input, config=config)
+        async with tool_slots:
+            result = await run_with_progress(initial_input, config)
         
-        snapshot = graph.get_state(config)
+        snapshot = await runtime.get_state(config)
         # Check if we are at the Human Review node (interrupted)
         is_interrupted = bool(snapshot.next)
         status = "Waiting for Human Review" if is_interrupted else "Completed"
@@ -89,13 +164,48 @@ async def call_tool(name: str, arguments: dict) -> list[types.TextContent | type
             
         return [types.TextContent(type="text", text=output_text)]
 
+    elif name == "generate_protocols":
+        intents = arguments.get("intents") or []
+        if not intents or len(intents) > BATCH_MAX_INTENTS:
+            return [types.TextContent(type="text", text=f"Provide between 1 and {BATCH_MAX_INTENTS} intents.")]
+
+        # One progress notification per finished thread, so clients can show results early
+        ctx, progress_token = progress_context()
+        results = []
+        # Every graph of the batch takes its own tool slot, so a batch counts against MCP_CONCURRENCY
+        async for result in run_batch(intents, run_slots=tool_slots):
+            results.append(result)
+            if progress_token is not None:
+                await ctx.session.send_progress_notification(
+                    progress_token,
+                    len(results),
+                    total=len(intents),
+                    message=f"[{result['index']}] {result['status']}: thread {result['thread_id']}",
+                    related_request_id=ctx.request_id,
+                )
+
+        output_text = f"--- FlowState Batch ({len(intents)} intents) ---\n"
+        for result in sorted(results, key=lambda r: r["index"]):
+            output_text += f"\n[{result['index']}] {result['intent']}\n"
+            output_text += f"Thread ID: {result['thread_id']}\n"
+            if result["status"] == "failed":
+                output_text += f"Status: Failed ({result['error']})\n"
+                continue
+            state = result["state"]
+            output_text += f"Status: {'Waiting for Human Review' if result['status'] == 'interrupted' else 'Completed'}\n"
+            output_text += f"Safety Score: {state.get('safety_score')}  Empathy Score: {state.get('empathy_score')}\n"
+            output_text += f"--- Current Draft ---\n{state.get('current_draft')}\n"
+
+        output_text += "\nUse 'review_protocol' with each Thread ID to approve or revise."
+        return [types.TextContent(type="text", text=output_text)]
+
     elif name == "review_protocol":
         thread_id = arguments.get("thread_id")
         action = arguments.get("action")
         feedback = arguments.get("feedback")
         
         config = {"configurable": {"thread_id": thread_id}}
-        snapshot = graph.get_state(config)
+        snapshot = await runtime.get_state(config)
         
         if not snapshot.next:
             return [types.TextContent(type="text", text=f"Thread {thread_id} is already completed or not found.")]
@@ -105,12 +215,13 @@ async def call_tool(name: str, arguments: dict) -> list[types.TextContent | type
         if feedback:
             updates["feedback_from_agents"] = {"human": feedback}
             
-        graph.update_state(config, updates)
+        await runtime.update_state(config, updates)
         
         # Resume graph execution (None input resumes from interruption)
-        result = graph.invoke(None, config=config)
+        async with tool_slots:
+            result = await run_with_progress(None, config)
 
-        final_snapshot = graph.get_state(config)
+        final_snapshot = await runtime.get_state(config)
         is_finished = not final_snapshot.next
         
         status_msg = "Protocol Approved & Finalized!" if is_finished else "Feedback Submitted. New Draft Generated."
@@ -128,6 +239,8 @@ async def call_tool(name: str, arguments: dict) -> list[types.TextContent | type
     raise ValueError(f"Unknown tool: {name}")
 
 async def main():
+    # Compile the graph while the client is still initializing and listing tools
+    preload_graph()
     # Run the server using stdin/stdout streams
     async with stdio_server() as (read_stream, write_stream):
         await app.run(
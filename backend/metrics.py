@@ -0,0 +1,360 @@
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Callable, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+trace_logger = logging.getLogger("flowstate.trace")
+
+# Threads whose traces are kept in memory for GET /thread/{id}/trace, and events per thread.
+TRACE_MAX_THREADS = int(os.getenv("TRACE_MAX_THREADS", "1000"))
+TRACE_MAX_EVENTS = int(os.getenv("TRACE_MAX_EVENTS", "500"))
+# JSON-lines file receiving every supervisor decision with its inputs, for tuning the
+# supervisor policy (see `python -m backend.agents.supervisor report`); empty = off.
+SUPERVISOR_DECISION_LOG = os.getenv("SUPERVISOR_DECISION_LOG", "")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+COUNT_BUCKETS = (1, 2, 3, 4, 5, 6, 8, 10)
+
+
+def _labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{str(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name, self.help, self.labels = name, help, labels
+        self._values: dict[tuple, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] += amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for values, total in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, values)} {total}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        self._counts: dict[tuple, list[int]] = {}
+        self._sums: dict[tuple, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        with self._lock:
+            counts = self._counts.setdefault(label_values, [0] * (len(self.buckets) + 1))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._sums[label_values] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for values, counts in sorted(self._counts.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{self.name}_bucket{_labels(self.labels + ('le',), values + (le,))} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.labels, values)} {self._sums[values]}")
+                lines.append(f"{self.name}_count{_labels(self.labels, values)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """Gauge whose value is read from a callback at scrape time."""
+
+    def __init__(self, name: str, help: str, read: Callable[[], float], type: str = "gauge"):
+        self.name, self.help, self.read, self.type = name, help, read, type
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}", f"{self.name} {self.read()}"]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: "OrderedDict[str, object]" = OrderedDict()
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def gauge(self, name: str, help: str, read: Callable[[], float], type: str = "gauge"):
+        return self.register(Gauge(name, help, read, type))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+node_duration = registry.register(Histogram(
+    "flowstate_node_duration_seconds", "Wall time of each graph node", ("node",)))
+node_errors = registry.register(Counter(
+    "flowstate_node_errors_total", "Graph node executions that raised", ("node",)))
+llm_duration = registry.register(Histogram(
+    "flowstate_llm_request_duration_seconds", "LLM request latency", ("node", "model")))
+llm_tokens = registry.register(Counter(
+    "flowstate_llm_tokens_total", "LLM tokens by kind (prompt/completion)", ("node", "model", "kind")))
+llm_errors = registry.register(Counter(
+    "flowstate_llm_errors_total", "Failed LLM requests", ("node", "model")))
+llm_retries = registry.register(Counter(
+    "flowstate_llm_retries_total", "LLM request retries", ("node", "backend")))
+llm_backend_requests = registry.register(Counter(
+    "flowstate_llm_backend_requests_total", "LLM attempts per backend by outcome (ok/error/timeout/cancelled)",
+    ("backend", "outcome")))
+llm_hedges = registry.register(Counter(
+    "flowstate_llm_hedged_requests_total", "Backup LLM requests sent because the first was slow", ("node",)))
+llm_circuit_opens = registry.register(Counter(
+    "flowstate_llm_circuit_open_total", "Times a backend's circuit breaker opened", ("backend",)))
+checkpoint_bytes = registry.register(Histogram(
+    "flowstate_checkpoint_write_bytes", "Serialized bytes per checkpoint write", ("op",), BYTES_BUCKETS))
+checkpoint_duration = registry.register(Histogram(
+    "flowstate_checkpoint_write_duration_seconds", "Checkpoint write latency", ("op",)))
+supervisor_decisions = registry.register(Counter(
+    "flowstate_supervisor_decisions_total", "Supervisor routing decisions", ("decision",)))
+supervisor_reasons = registry.register(Counter(
+    "flowstate_supervisor_decision_reasons_total", "Supervisor decisions by reason and policy",
+    ("decision", "reason", "policy")))
+safety_prescreen = registry.register(Counter(
+    "flowstate_safety_prescreen_total", "Rule-based safety pre-screen outcomes (critical/clean/escalated)", ("outcome",)))
+intent_reuse = registry.register(Counter(
+    "flowstate_intent_reuse_total", "New threads seeded without a graph run (cache or coalesced)", ("source",)))
+iterations = registry.register(Histogram(
+    "flowstate_iterations", "Drafting iterations when the loop stops for human review", (), COUNT_BUCKETS))
+
+
+# --- Per-thread traces ---
+
+class TraceStore:
+    """Bounded in-memory structured traces per thread, also emitted as JSON log lines."""
+
+    def __init__(self, max_threads: int = TRACE_MAX_THREADS, max_events: int = TRACE_MAX_EVENTS):
+        self.max_threads = max_threads
+        self.max_events = max_events
+        self._traces: "OrderedDict[str, list[dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, thread_id: Optional[str], kind: str, **fields):
+        if not thread_id:
+            return
+        event = {"ts": time.time(), "thread_id": thread_id, "type": kind, **fields}
+        with self._lock:
+            events = self._traces.setdefault(thread_id, [])
+            self._traces.move_to_end(thread_id)
+            events.append(event)
+            del events[:-self.max_events]
+            while len(self._traces) > self.max_threads:
+                self._traces.popitem(last=False)
+        trace_logger.info(json.dumps(event, default=str))
+
+    def get(self, thread_id: str) -> list[dict]:
+        with self._lock:
+            return list(self._traces.get(thread_id, []))
+
+
+traces = TraceStore()
+
+
+class ThreadUsage:
+    """
+    LLM tokens and graph wall time per thread since the supervisor last collected them.
+    The supervisor adds them to the thread's state, where its budgets are checked.
+    """
+
+    def __init__(self, max_threads: int = TRACE_MAX_THREADS):
+        self.max_threads = max_threads
+        self._usage: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _entry(self, thread_id: str) -> list:
+        entry = self._usage.get(thread_id)
+        if entry is None:
+            # [tokens, time the graph started working on the thread]
+            entry = self._usage[thread_id] = [0, time.monotonic()]
+            while len(self._usage) > self.max_threads:
+                self._usage.popitem(last=False)
+        return entry
+
+    def start(self, thread_id: Optional[str]):
+        """Start the clock for a thread unless it is running already."""
+        if thread_id:
+            with self._lock:
+                self._entry(thread_id)
+
+    def add_tokens(self, thread_id: Optional[str], tokens: int):
+        if thread_id:
+            with self._lock:
+                self._entry(thread_id)[0] += tokens
+
+    def take(self, thread_id: Optional[str]) -> tuple[int, float]:
+        """(tokens, seconds) since the last call for this thread, and stop its clock."""
+        with self._lock:
+            entry = self._usage.pop(thread_id, None) if thread_id else None
+        if entry is None:
+            return 0, 0.0
+        return entry[0], time.monotonic() - entry[1]
+
+
+thread_usage = ThreadUsage()
+
+
+def thread_id_of(config: Optional[dict]) -> Optional[str]:
+    return ((config or {}).get("configurable") or {}).get("thread_id")
+
+
+def instrument_node(name: str, fn):
+    """Wrap a graph node to record its wall time (metrics + thread trace)."""
+
+    # Not functools.wraps: LangGraph inspects the signature to decide whether to pass `config`.
+    def node(state, config):
+        started = time.perf_counter()
+        thread_usage.start(thread_id_of(config))
+        error = None
+        try:
+            return fn(state)
+        except Exception as e:
+            error = str(e)
+            node_errors.inc(name)
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            node_duration.observe(duration, name)
+            traces.record(thread_id_of(config), "node", node=name, duration_s=duration, error=error)
+
+    node.__name__ = getattr(fn, "__name__", name)
+    return node
+
+
+_decision_log_lock = threading.Lock()
+
+
+def record_decision(decision: str, state: dict, thread_id: Optional[str] = None):
+    last = state.get("last_decision") or {}
+    reason, policy = last.get("reason", "unknown"), last.get("policy", "default")
+    supervisor_decisions.inc(decision)
+    supervisor_reasons.inc(decision, reason, policy)
+    if decision in ("halt", "approve"):
+        iterations.observe(state.get("iteration_count", 0))
+    event = {
+        "decision": decision, "reason": reason, "policy": policy, "tenant": state.get("tenant"),
+        "iteration": state.get("iteration_count"),
+        "safety_score": state.get("safety_score"), "empathy_score": state.get("empathy_score"),
+        "tokens_used": state.get("tokens_used"), "elapsed_s": state.get("elapsed_s"),
+    }
+    traces.record(thread_id, "decision", **event)
+    if SUPERVISOR_DECISION_LOG:
+        line = json.dumps({"ts": time.time(), "thread_id": thread_id, **event,
+                           "score_history": state.get("score_history", [])}, default=str)
+        with _decision_log_lock, open(SUPERVISOR_DECISION_LOG, "a") as f:
+            f.write(line + "\n")
+
+
+class LLMMetricsHandler(BaseCallbackHandler):
+    """Callback recording latency and token usage of every chat model call."""
+
+    def __init__(self):
+        self._runs: dict = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        metadata = metadata or {}
+        with self._lock:
+            self._runs[run_id] = (
+                time.perf_counter(),
+                metadata.get("langgraph_node", "unknown"),
+                metadata.get("ls_model_name") or (kwargs.get("invocation_params") or {}).get("model", "unknown"),
+                metadata.get("thread_id"),
+            )
+
+    def _finish(self, run_id):
+        with self._lock:
+            return self._runs.pop(run_id, None)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        run = self._finish(run_id)
+        if not run:
+            return
+        started, node, model, thread_id = run
+        duration = time.perf_counter() - started
+        llm_duration.observe(duration, node, model)
+
+        usage = {}
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or usage
+        prompt_tokens = usage.get("input_tokens", 0)
+        completion_tokens = usage.get("output_tokens", 0)
+        llm_tokens.inc(node, model, "prompt", amount=prompt_tokens)
+        llm_tokens.inc(node, model, "completion", amount=completion_tokens)
+        thread_usage.add_tokens(thread_id, prompt_tokens + completion_tokens)
+        traces.record(thread_id, "llm", node=node, model=model, duration_s=duration,
+                      prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        run = self._finish(run_id)
+        if not run:
+            return
+        started, node, model, thread_id = run
+        llm_errors.inc(node, model)
+        traces.record(thread_id, "llm_error", node=node, model=model,
+                      duration_s=time.perf_counter() - started, error=str(error))
+
+
+llm_metrics_handler = LLMMetricsHandler()
+
+
+class _MeteredSerde:
+    """Serializer proxy counting the bytes each checkpoint write produces (per thread)."""
+
+    def __init__(self, inner, counter: threading.local):
+        self._inner = inner
+        self._counter = counter
+
+    def dumps_typed(self, obj):
+        type_, data = self._inner.dumps_typed(obj)
+        self._counter.bytes = getattr(self._counter, "bytes", 0) + len(data)
+        return type_, data
+
+    def __getattr__(self, name):
+        return getattr(self._inner, name)
+
+
+def instrument_checkpointer(saver):
+    """Record size and latency of every checkpoint `put` / `put_writes` on a saver instance."""
+    counter = threading.local()
+    saver.serde = _MeteredSerde(saver.serde, counter)
+
+    def timed(op: str, method):
+        def wrapper(config, *args, **kwargs):
+            counter.bytes = 0
+            started = time.perf_counter()
+            try:
+                return method(config, *args, **kwargs)
+            finally:
+                duration = time.perf_counter() - started
+                checkpoint_duration.observe(duration, op)
+                checkpoint_bytes.observe(counter.bytes, op)
+                traces.record(thread_id_of(config), "checkpoint", op=op, bytes=counter.bytes, duration_s=duration)
+        return wrapper
+
+    saver.put = timed("put", saver.put)
+    saver.put_writes = timed("put_writes", saver.put_writes)
+    return saver
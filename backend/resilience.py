@@ -0,0 +1,392 @@
+"""
+Resilient LLM calls: deadlines, retries, hedging, and load balancing with circuit breakers.
+
+`config.get_llm()` wraps the per-endpoint clients of a role in a ResilientChatModel. A role's
+base URL may list several Ollama/OpenAI-compatible endpoints separated by commas
+(e.g. OLLAMA_BASE_URL=http://gpu1:11434,http://gpu2:11434); every call goes to the healthy
+endpoint with the fewest requests in flight.
+"""
+import contextvars
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from typing import Iterator, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel, generate_from_stream
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+from backend.config import run_metadata, slot_wait
+from backend.metrics import llm_backend_requests, llm_circuit_opens, llm_hedges, llm_retries
+
+# Longest wait for the first token, and between two tokens, of one attempt.
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+# Overall deadline of one call, retries and streaming included.
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "300"))
+# Retries after a failed or timed-out attempt (only before the first token was returned).
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+# Base of the exponential backoff; each pause is drawn uniformly from [0, base * 2^retry).
+LLM_RETRY_BACKOFF_SECONDS = float(os.getenv("LLM_RETRY_BACKOFF_SECONDS", "0.5"))
+# Send a backup request to another endpoint when no token arrived after this long (0 = off).
+LLM_HEDGE_AFTER_SECONDS = float(os.getenv("LLM_HEDGE_AFTER_SECONDS", "0"))
+# Consecutive failures that open an endpoint's circuit, and how long it stays open
+# before one trial request is let through.
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "3"))
+LLM_BREAKER_COOLDOWN_SECONDS = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+# Interval of the background health probe (GET /api/version or /models) per endpoint (0 = off).
+LLM_HEALTH_INTERVAL_SECONDS = float(os.getenv("LLM_HEALTH_INTERVAL_SECONDS", "10"))
+
+# Weight of the newest sample in an endpoint's latency average.
+_EWMA_ALPHA = 0.3
+
+
+class LLMUnavailableError(RuntimeError):
+    """Every attempt of an LLM call failed or the call ran past its deadline."""
+
+
+class Endpoint:
+    """
+    Shared state of one backend URL: requests in flight, time-to-first-token average
+    and circuit breaker (closed -> open after LLM_BREAKER_FAILURES -> half-open trial).
+    """
+
+    def __init__(self, url: str, probe_path: str = ""):
+        self.url = url
+        self.probe_path = probe_path
+        self.in_flight = 0
+        self.latency: Optional[float] = None
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= LLM_BREAKER_COOLDOWN_SECONDS:
+            return "half_open"
+        return "open"
+
+    def allows_request(self) -> bool:
+        state = self.state
+        return state == "closed" or (state == "half_open" and not self.probing)
+
+    def load(self) -> tuple:
+        return self.in_flight, self.latency or 0.0
+
+    def begin(self):
+        with self._lock:
+            self.in_flight += 1
+            if self.state == "half_open":
+                self.probing = True
+
+    def observe(self, latency: float):
+        """Add a time-to-first-token sample (or a lower bound, for an attempt that lost a hedge)."""
+        with self._lock:
+            self.latency = latency if self.latency is None else (
+                _EWMA_ALPHA * latency + (1 - _EWMA_ALPHA) * self.latency)
+
+    def succeeded(self):
+        with self._lock:
+            self.in_flight -= 1
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def failed(self):
+        with self._lock:
+            self.in_flight -= 1
+            self._fail()
+
+    def released(self):
+        with self._lock:
+            self.in_flight -= 1
+            self.probing = False
+
+    def _fail(self):
+        self.failures += 1
+        was_probing, self.probing = self.probing, False
+        if self.opened_at is None and self.failures >= LLM_BREAKER_FAILURES:
+            llm_circuit_opens.inc(self.url)
+            print(f"--- [LLM] Circuit open for {self.url} after {self.failures} failures ---", file=sys.stderr)
+            self.opened_at = time.monotonic()
+        elif was_probing or self.opened_at is not None:
+            self.opened_at = time.monotonic()  # trial failed: stay open for another cooldown
+
+    def probe(self):
+        """Health check: a reachable endpoint gets its trial request now, an unreachable one opens."""
+        import httpx
+
+        try:
+            httpx.get(self.url.rstrip("/") + self.probe_path, timeout=2.0).raise_for_status()
+        except Exception:
+            with self._lock:
+                if self.opened_at is None:
+                    self.failures = max(self.failures, LLM_BREAKER_FAILURES - 1)
+                self._fail()
+            return
+        with self._lock:
+            if self.opened_at is not None:
+                self.opened_at = time.monotonic() - LLM_BREAKER_COOLDOWN_SECONDS
+
+
+_endpoints: dict[str, Endpoint] = {}
+_endpoints_lock = threading.Lock()
+_health_thread: Optional[threading.Thread] = None
+
+
+def endpoint(url: str, probe_path: str = "") -> Endpoint:
+    """The process-wide Endpoint for a URL, shared by every role that calls it."""
+    global _health_thread
+    with _endpoints_lock:
+        found = _endpoints.get(url)
+        if found is None:
+            found = _endpoints[url] = Endpoint(url, probe_path)
+        if _health_thread is None and probe_path and LLM_HEALTH_INTERVAL_SECONDS > 0:
+            _health_thread = threading.Thread(target=_health_loop, daemon=True, name="llm-health")
+            _health_thread.start()
+    return found
+
+
+def open_circuits() -> int:
+    with _endpoints_lock:
+        return sum(e.state != "closed" for e in _endpoints.values())
+
+
+def _health_loop():
+    while True:
+        time.sleep(LLM_HEALTH_INTERVAL_SECONDS)
+        with _endpoints_lock:
+            probed = [e for e in _endpoints.values() if e.probe_path and e.url.startswith("http")]
+        for e in probed:
+            e.probe()
+
+
+class _Race:
+    """
+    Attempts of one call, each streaming on its own thread into a shared queue.
+    The first attempt to produce output wins; the others are told to stop.
+
+    An attempt first queues for one of the backend's LLM_MAX_IN_FLIGHT slots; it reports
+    a "sent" event once it holds one, and its timeouts run from then. A busy backend is
+    not a failing one, and an attempt given up while queued never reaches the backend.
+    """
+
+    def __init__(self, messages, stop, kwargs):
+        self.messages, self.stop, self.kwargs = messages, stop, kwargs
+        self.events: "queue.Queue[tuple[int, str, object]]" = queue.Queue()
+        self.attempts: list[tuple[Endpoint, threading.Event]] = []
+        self.sent: dict[int, float] = {}
+        self.finished: set[int] = set()
+        self.answered: set[int] = set()
+
+    @property
+    def live(self) -> int:
+        return len(self.attempts) - len(self.finished)
+
+    def start(self, target: Endpoint, client: BaseChatModel):
+        attempt = len(self.attempts)
+        cancelled = threading.Event()
+        self.attempts.append((target, cancelled))
+        target.begin()
+        # copy_context: the backend slot reads the run's priority from the context
+        context = contextvars.copy_context()
+        threading.Thread(target=context.run, args=(self._pump, attempt, client, cancelled),
+                         daemon=True, name="llm-attempt").start()
+
+    def _pump(self, attempt: int, client: BaseChatModel, cancelled: threading.Event):
+        stream = None
+        slot_wait.set((cancelled, lambda: self.events.put((attempt, "sent", time.monotonic()))))
+        try:
+            stream = client._stream(self.messages, stop=self.stop, **self.kwargs)
+            for chunk in stream:
+                self.events.put((attempt, "chunk", chunk))
+                if cancelled.is_set():
+                    return
+            self.events.put((attempt, "done", None))
+        except Exception as e:
+            self.events.put((attempt, "error", e))
+        finally:
+            if stream is not None:
+                stream.close()  # drops the connection, stopping generation on the backend
+
+    def next(self, until: float, attempt: Optional[int] = None) -> Optional[tuple[int, str, object]]:
+        """Next event (of `attempt` only, if given), or None once `until` passes."""
+        while True:
+            try:
+                event = self.events.get(timeout=max(until - time.monotonic(), 0))
+            except queue.Empty:
+                return None
+            if attempt is None or event[0] == attempt:
+                return event
+
+    def finish(self, attempt: int, outcome: str):
+        if attempt in self.finished:
+            return
+        self.finished.add(attempt)
+        target, cancelled = self.attempts[attempt]
+        cancelled.set()
+        if attempt not in self.sent:
+            outcome = "cancelled"  # never left the slot queue: says nothing about the backend
+        if outcome == "ok":
+            target.succeeded()
+        elif outcome == "cancelled":
+            if attempt in self.sent and attempt not in self.answered:
+                target.observe(time.monotonic() - self.sent[attempt])
+            target.released()
+        else:
+            target.failed()
+        llm_backend_requests.inc(target.url, outcome)
+
+    def cancel(self, keep: Optional[int] = None):
+        for attempt in range(len(self.attempts)):
+            if attempt != keep:
+                self.finish(attempt, "cancelled")
+
+
+class ResilientChatModel(BaseChatModel):
+    """
+    Chat model spreading calls over the clients of several endpoints.
+
+    Each call picks the least-loaded endpoint whose circuit is closed, waits at most
+    LLM_TIMEOUT_SECONDS for the first token (hedging to a second endpoint after
+    LLM_HEDGE_AFTER_SECONDS), and retries failed attempts with jittered exponential backoff
+    until LLM_DEADLINE_SECONDS. Once tokens have been returned a failure is raised as is.
+    """
+
+    model: str
+    temperature: Optional[float] = None
+    _backends: list[tuple[Endpoint, BaseChatModel]] = PrivateAttr(default_factory=list)
+
+    def __init__(self, backends: list[tuple[str, BaseChatModel]], probe_path: str = "", **kwargs):
+        super().__init__(**kwargs)
+        self._backends = [(endpoint(url, probe_path), client) for url, client in backends]
+
+    @property
+    def _llm_type(self) -> str:
+        return "resilient"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"model": self.model, "endpoints": [e.url for e, _ in self._backends]}
+
+    def _client(self, client: BaseChatModel) -> BaseChatModel:
+        if self.temperature is not None and "temperature" in type(client).model_fields:
+            return client.model_copy(update={"temperature": self.temperature})
+        return client
+
+    def _pick(self, exclude: list[Endpoint]) -> Optional[tuple[Endpoint, BaseChatModel]]:
+        candidates = [b for b in self._backends if b[0] not in exclude and b[0].allows_request()]
+        if not candidates:
+            return None
+        target, client = min(candidates, key=lambda b: b[0].load())
+        return target, self._client(client)
+
+    def _choose(self, tried: list[Endpoint]) -> tuple[Endpoint, BaseChatModel]:
+        """An untried healthy endpoint, else any healthy one, else the least-loaded one anyway."""
+        chosen = self._pick(tried) or self._pick([])
+        if chosen is None:
+            target, client = min(self._backends, key=lambda b: (b[0] in tried, b[0].load()))
+            chosen = target, self._client(client)
+        return chosen
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return generate_from_stream(self._stream(messages, stop=stop, **kwargs))
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        node = run_metadata().get("langgraph_node", "unknown")
+        deadline = time.monotonic() + LLM_DEADLINE_SECONDS
+        tried: list[Endpoint] = []
+        last_error: Optional[BaseException] = None
+
+        for retry in range(LLM_MAX_RETRIES + 1):
+            if retry:
+                pause = random.uniform(0, LLM_RETRY_BACKOFF_SECONDS * 2 ** (retry - 1))
+                if time.monotonic() + pause >= deadline:
+                    break
+                time.sleep(pause)
+
+            race = _Race(messages, stop, kwargs)
+            target, client = self._choose(tried)
+            if retry:
+                llm_retries.inc(node, target.url)
+                print(f"--- [LLM] Retry {retry}/{LLM_MAX_RETRIES} on {target.url} ({last_error}) ---", file=sys.stderr)
+            tried.append(target)
+            race.start(target, client)
+
+            streaming = False
+            try:
+                first = self._first_event(race, node, deadline, tried)
+                attempt, kind, payload = first
+                target = race.attempts[attempt][0]
+                target.observe(time.monotonic() - race.sent[attempt])
+                race.answered.add(attempt)
+                race.cancel(keep=attempt)
+                while kind == "chunk":
+                    streaming = True
+                    yield payload
+                    event = race.next(min(deadline, time.monotonic() + LLM_TIMEOUT_SECONDS), attempt)
+                    if event is None:
+                        race.finish(attempt, "timeout")
+                        raise LLMUnavailableError(f"LLM stream stalled on {race.attempts[attempt][0].url}")
+                    _, kind, payload = event
+                if kind == "error":
+                    race.finish(attempt, "error")
+                    raise payload
+                race.finish(attempt, "ok")
+                return
+            except Exception as e:
+                race.cancel()
+                if streaming:
+                    raise
+                last_error = e
+            finally:
+                race.cancel()  # consumer stopped early (e.g. a cancelled critic)
+
+        raise LLMUnavailableError(f"LLM call failed after {len(tried)} attempt(s): {last_error}") from last_error
+
+    def _first_event(self, race: _Race, node: str, deadline: float, tried: list[Endpoint]) -> tuple:
+        """
+        Wait for the first chunk of any attempt, hedging once; raise if none arrives in time.
+        The timeout and hedge delay count from when the first attempt got a backend slot.
+        """
+        timeout_at, hedge_at = deadline, None
+        error: Optional[BaseException] = None
+
+        while True:
+            event = race.next(min(timeout_at, hedge_at) if hedge_at else timeout_at)
+            if event is None:
+                if not race.sent:
+                    race.cancel()
+                    raise LLMUnavailableError(f"no backend slot within the {LLM_DEADLINE_SECONDS:g}s deadline")
+                if hedge_at and time.monotonic() < timeout_at:
+                    hedge_at = None
+                    backup = self._pick(tried)
+                    if backup:
+                        llm_hedges.inc(node)
+                        tried.append(backup[0])
+                        race.start(*backup)
+                    continue
+                for attempt in range(len(race.attempts)):
+                    race.finish(attempt, "timeout")
+                raise TimeoutError(f"no response within {LLM_TIMEOUT_SECONDS:g}s")
+
+            attempt, kind, payload = event
+            if kind == "sent":
+                race.sent[attempt] = payload
+                if attempt == 0:
+                    timeout_at = min(deadline, payload + LLM_TIMEOUT_SECONDS)
+                    hedge_at = payload + LLM_HEDGE_AFTER_SECONDS if LLM_HEDGE_AFTER_SECONDS else None
+                continue
+            if attempt in race.finished:
+                continue
+            if kind != "error":
+                return event
+            race.finish(attempt, "error")
+            error = payload
+            if not race.live:
+                raise error
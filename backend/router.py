@@ -0,0 +1,240 @@
+"""
+Thread-affinity router in front of several API shards (see `backend.sharding`).
+
+    SHARDS="a=http://127.0.0.1:8001,b=http://127.0.0.1:8002" uvicorn backend.router:app --port 8000
+
+Requests for a thread go to the shard that owns it, unchanged (SSE streams and ETags pass
+through). New threads get their id here so the owner is known before the run starts;
+GET /threads and POST /threads/batch fan out to every shard and merge the results.
+"""
+from contextlib import asynccontextmanager
+from typing import Optional
+import asyncio
+import json
+import math
+import sys
+import uuid
+
+import httpx
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from backend.sharding import SHARDS, parse_shards, shard_for
+
+# Page size bounds for GET /threads, as on the workers
+THREADS_PAGE_DEFAULT = 50
+THREADS_PAGE_MAX = 500
+
+# Hop-by-hop headers are not forwarded in either direction
+HOP_HEADERS = {"connection", "keep-alive", "transfer-encoding", "te", "trailer", "upgrade",
+               "proxy-authorization", "proxy-authenticate", "host", "content-length"}
+
+shards = parse_shards(SHARDS)
+client: Optional[httpx.AsyncClient] = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global client
+    if not shards:
+        raise RuntimeError("SHARDS is not set")
+    # No read timeout: runs and SSE streams stay open for minutes
+    client = httpx.AsyncClient(timeout=httpx.Timeout(None, connect=5))
+    print(f"--- [Router] Routing to {len(shards)} shards: {', '.join(shards)} ---", file=sys.stderr)
+    yield
+    await client.aclose()
+
+app = FastAPI(lifespan=lifespan)
+
+def owner(thread_id: str) -> str:
+    return shard_for(thread_id, shards)
+
+def forward_headers(headers) -> dict:
+    return {k: v for k, v in headers.items() if k.lower() not in HOP_HEADERS}
+
+async def send(shard: str, method: str, path: str, params=None, headers=None, content=None, json_body=None):
+    """Open a streamed request to a shard; 503 when it cannot be reached."""
+    request = client.build_request(method, shards[shard] + path, params=params, headers=headers,
+                                   content=content, json=json_body)
+    try:
+        return await client.send(request, stream=True)
+    except httpx.TransportError as e:
+        print(f"--- [Router] Shard {shard} unreachable: {e} ---", file=sys.stderr)
+        raise HTTPException(status_code=503, detail=f"Shard {shard} unavailable")
+
+async def relay(shard: str, upstream: httpx.Response) -> StreamingResponse:
+    """Pass a shard's response through as it arrives."""
+    headers = forward_headers(upstream.headers)
+    headers["X-Shard"] = shard
+    return StreamingResponse(upstream.aiter_raw(), status_code=upstream.status_code, headers=headers,
+                             background=upstream.aclose)
+
+@app.post("/thread")
+async def start_thread(request: Request):
+    """Assign the thread id (unless given) and start the run on its shard."""
+    try:
+        body = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+    if not isinstance(body, dict):
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+    if not body.get("thread_id"):  # absent or null
+        body["thread_id"] = str(uuid.uuid4())
+    shard = owner(str(body["thread_id"]))
+    upstream = await send(shard, "POST", "/thread", request.query_params, forward_headers(request.headers),
+                          json_body=body)
+    return await relay(shard, upstream)
+
+@app.api_route("/thread/{thread_id}{rest:path}", methods=["GET", "POST"])
+async def proxy_thread(thread_id: str, rest: str, request: Request):
+    """Everything under /thread/{id} is served by the shard owning the thread."""
+    shard = owner(thread_id)
+    upstream = await send(shard, request.method, request.url.path, request.query_params,
+                          forward_headers(request.headers), content=await request.body())
+    return await relay(shard, upstream)
+
+@app.get("/threads")
+async def list_threads(
+    request: Request,
+    created_before: Optional[float] = None,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(THREADS_PAGE_DEFAULT, ge=1, le=THREADS_PAGE_MAX),
+):
+    """
+    List threads across shards, newest first. Every shard is read in pages of at most
+    THREADS_PAGE_MAX with a keyset cursor on `created_at`, and the pages are merged until
+    offset+limit threads have been seen; other filters are passed on unchanged.
+    """
+    filters = {k: v for k, v in request.query_params.items() if k not in ("created_before", "offset", "limit")}
+
+    async def fetch(shard: str, before: Optional[float], skip: int, size: int) -> dict:
+        params = {**filters, "offset": skip, "limit": size}
+        if before is not None:
+            params["created_before"] = before
+        try:
+            response = await client.get(shards[shard] + "/threads", params=params)
+        except httpx.TransportError:
+            raise HTTPException(status_code=503, detail=f"Shard {shard} unavailable")
+        if response.status_code != 200:
+            # Validation errors are the same on every shard: pass the first one on
+            raise HTTPException(status_code=response.status_code, detail=response.json().get("detail"))
+        return response.json()
+
+    class Cursor:
+        """Unread threads of one shard, refilled a page at a time."""
+
+        def __init__(self, shard: str, page: dict):
+            self.shard, self.buffer, self.total = shard, page["threads"], page["total"]
+            self.done = len(self.buffer) < page["limit"]
+            self.last, self.ties = None, 0  # newest created_at consumed and how many rows had it
+
+        async def head(self) -> Optional[dict]:
+            if not self.buffer and not self.done:
+                # Rows up to and including `last` (created_before is exclusive), skipping
+                # those already consumed; shards break ties in a fixed order so this is stable
+                page = await fetch(self.shard, math.nextafter(self.last, math.inf), self.ties, THREADS_PAGE_MAX)
+                self.buffer, self.done = page["threads"], len(page["threads"]) < THREADS_PAGE_MAX
+            return self.buffer[0] if self.buffer else None
+
+        def pop(self) -> dict:
+            thread = self.buffer.pop(0)
+            if thread["created_at"] == self.last:
+                self.ties += 1
+            else:
+                self.last, self.ties = thread["created_at"], 1
+            return thread
+
+    first_size = min(offset + limit, THREADS_PAGE_MAX)
+    pages = await asyncio.gather(*(fetch(shard, created_before, 0, first_size) for shard in shards))
+    cursors = [Cursor(shard, page) for shard, page in zip(shards, pages)]
+
+    threads, seen = [], 0
+    while seen < offset + limit:
+        heads = [(thread, cursor) for cursor in cursors if (thread := await cursor.head()) is not None]
+        if not heads:
+            break
+        _, cursor = max(heads, key=lambda head: head[0]["created_at"])
+        thread = cursor.pop()
+        if seen >= offset:
+            threads.append(thread)
+        seen += 1
+    return {"threads": threads, "total": sum(cursor.total for cursor in cursors), "offset": offset, "limit": limit}
+
+@app.post("/threads/batch")
+async def start_batch(request: Request):
+    """
+    Split a batch by owning shard, run the parts concurrently and merge their NDJSON
+    streams: result lines keep the caller's intent index, and one `batch_end` closes the batch.
+    """
+    body = await request.json()
+    intents = body.get("intents") or []
+    thread_ids = body.get("thread_ids") or [str(uuid.uuid4()) for _ in intents]
+    if not intents or len(thread_ids) != len(intents):
+        raise HTTPException(status_code=400, detail="Give intents and, optionally, one thread id per intent")
+
+    parts: dict[str, list[int]] = {}
+    for index, thread_id in enumerate(thread_ids):
+        parts.setdefault(owner(thread_id), []).append(index)
+
+    # Open every part before streaming so a rejected part fails the whole request
+    upstreams = {}
+    try:
+        for shard, indexes in parts.items():
+            upstream = await send(shard, "POST", "/threads/batch", json_body={
+                "intents": [intents[i] for i in indexes], "thread_ids": [thread_ids[i] for i in indexes],
+                "tenant": body.get("tenant"),
+            })
+            upstreams[shard] = upstream
+            if upstream.status_code != 200:
+                detail = json.loads(await upstream.aread()).get("detail")
+                raise HTTPException(status_code=upstream.status_code, detail=f"Shard {shard}: {detail}")
+    except BaseException:
+        for upstream in upstreams.values():
+            await upstream.aclose()
+        raise
+
+    async def results():
+        lines: asyncio.Queue = asyncio.Queue()
+
+        async def pump(shard: str, upstream: httpx.Response):
+            try:
+                async for line in upstream.aiter_lines():
+                    if line:
+                        await lines.put((shard, json.loads(line)))
+            finally:
+                await upstream.aclose()
+                await lines.put((shard, None))
+
+        pumps = [asyncio.create_task(pump(shard, upstream)) for shard, upstream in upstreams.items()]
+        counts = {"interrupted": 0, "completed": 0, "failed": 0}
+        batch_ids, open_parts = {}, len(pumps)
+        try:
+            while open_parts:
+                shard, event = await lines.get()
+                if event is None:
+                    open_parts -= 1
+                elif event.get("event") == "result":
+                    event["index"] = parts[shard][event["index"]]
+                    event["shard"] = shard
+                    yield json.dumps(event, default=str) + "\n"
+                elif event.get("event") == "batch_end":
+                    batch_ids[shard] = event["batch_id"]
+                    for status in counts:
+                        counts[status] += event.get(status, 0)
+        finally:
+            for task in pumps:
+                task.cancel()
+        yield json.dumps({"event": "batch_end", "batch_ids": batch_ids, **counts}) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+@app.get("/shards")
+async def list_shards():
+    """Configured shards and whether each answers."""
+    async def check(shard: str):
+        try:
+            response = await client.get(shards[shard] + "/metrics", timeout=5)
+            return {"name": shard, "url": shards[shard], "up": response.status_code == 200}
+        except httpx.HTTPError:
+            return {"name": shard, "url": shards[shard], "up": False}
+
+    return {"shards": await asyncio.gather(*(check(shard) for shard in shards))}
@@ -0,0 +1,183 @@
+import asyncio
+import functools
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from backend.graph import get_graph
+from backend.streaming import stream_graph
+from backend.drafts import hydrate_state
+from backend.config import llm_settings
+from backend.intents import intent_cache, normalize_intent, IntentCache
+from backend.agents.supervisor import decide, policy_for, supervisor_node
+from backend.metrics import intent_reuse, thread_id_of
+from backend.thread_index import thread_index
+
+# Maximum number of graph runs (drafter -> critics -> supervisor loops) executing at once.
+# Each run spends most of its time waiting on the LLM backend, so this is the knob that
+# decides how many protocol threads one worker process serves concurrently.
+GRAPH_CONCURRENCY = int(os.getenv("GRAPH_CONCURRENCY", "16"))
+
+# Graph runs get a dedicated, bounded pool so long LLM loops can never starve the
+# default executor that serves cheap state reads.
+_run_executor = ThreadPoolExecutor(max_workers=GRAPH_CONCURRENCY, thread_name_prefix="graph-run")
+
+# Single-flight: a new thread whose intent matches one already being drafted waits for
+# that run and starts from a copy of its result instead of running the graph again.
+INTENT_COALESCING = os.getenv("INTENT_COALESCING", "true").lower() in ("1", "true", "yes")
+
+# intent key -> (leader task, leader config)
+_in_flight: dict[str, tuple[asyncio.Task, dict]] = {}
+
+
+async def run_graph(input, config: dict) -> dict:
+    """
+    Run the graph until interrupt or end without blocking the event loop.
+
+    Node and token events are published to `GET /thread/{thread_id}/stream` subscribers.
+    Cancelling the awaiting task stops the run at its next step.
+
+    A new thread (input with a `user_intent`) may instead be seeded from a cached approved
+    draft or from a concurrent run for the same intent; see `backend/intents.py`.
+    """
+    if input and input.get("user_intent"):
+        return await _start_thread(input, config)
+    return await _execute(input, config)
+
+
+async def _execute(input, config: dict) -> dict:
+    loop = asyncio.get_running_loop()
+    cancel_event = threading.Event()
+    try:
+        result = await loop.run_in_executor(_run_executor, functools.partial(stream_graph, input, config, cancel_event))
+    except asyncio.CancelledError:
+        cancel_event.set()
+        raise
+    await asyncio.to_thread(_index, config)
+    if result and result.get("status") == "approved":
+        await asyncio.to_thread(_remember_approved, result, thread_id_of(config))
+    return await asyncio.to_thread(hydrate_state, result)
+
+
+def _index(config: dict):
+    """Refresh the thread's row in the listing/search index from its latest checkpoint."""
+    snapshot = get_graph().get_state(config)
+    thread_index.record(thread_id_of(config), snapshot.values, snapshot.next)
+    return snapshot
+
+
+def _drafter_model() -> str:
+    settings = llm_settings("drafter")
+    return f"{settings.provider}:{settings.model}"
+
+
+async def _start_thread(input, config: dict) -> dict:
+    intent = input["user_intent"]
+    model = _drafter_model()
+
+    cached = await asyncio.to_thread(intent_cache.get, intent, model)
+    # The cached draft must also pass this thread's supervisor policy (e.g. a stricter tenant)
+    if cached and supervisor_node({**cached, **input, "iteration_count": 1}) == "approve":
+        intent_reuse.inc("cache")
+        print(f"--- [Intents] Seeding thread from approved draft of {cached['seeded_from']} ---", file=sys.stderr)
+        return await asyncio.to_thread(_seed, config, {**cached, **input})
+
+    if not INTENT_COALESCING:
+        return await _execute(input, config)
+
+    # The tenant is part of the key: its supervisor policy may judge the same draft differently
+    key = (IntentCache.key(model, normalize_intent(intent)), input.get("tenant"))
+    if key in _in_flight:
+        leader, leader_config = _in_flight[key]
+        # asyncio.wait: cancelling this follower must not cancel the shared run
+        await asyncio.wait({leader})
+        if not leader.cancelled() and leader.exception() is None:
+            copied = await asyncio.to_thread(_copy_thread, leader_config, config, input)
+            if copied is not None:
+                intent_reuse.inc("coalesced")
+                return copied
+        return await _execute(input, config)
+
+    task = asyncio.ensure_future(_execute(input, config))
+    _in_flight[key] = (task, config)
+    task.add_done_callback(lambda _: _in_flight.pop(key, None))
+    return await task
+
+
+def _seed(config: dict, values: dict) -> dict:
+    """
+    Write a reviewed draft into a new thread as if the supervisor had just decided on it,
+    so the thread waits at human review exactly like a freshly generated one.
+    Callers make sure the thread's policy would not send the draft back for revision.
+    """
+    values = {"iteration_count": 1, "status": "reviewing", **values}
+    policy = policy_for(values)
+    decision, reason = decide(values, policy)
+    values["last_decision"] = {"decision": decision, "reason": reason, "policy": policy.name}
+    get_graph().update_state(config, values, as_node="supervisor")
+    return hydrate_state(_index(config).values)
+
+
+# State a coalesced follower does not inherit from the thread it copies
+LEADER_ONLY = ("tenant", "last_decision", "score_history", "tokens_used", "elapsed_s")
+
+
+def _copy_thread(source_config: dict, config: dict, input: dict):
+    snapshot = get_graph().get_state(source_config)
+    if "human_review" not in snapshot.next:
+        return None
+    # The draft and its scores are shared; the leader's tenant, usage and decisions are not
+    values = {k: v for k, v in snapshot.values.items() if k not in LEADER_ONLY}
+    values = {**values, **input, "seeded_from": thread_id_of(source_config)}
+    if supervisor_node(values) == "revise":
+        return None  # the follower's policy wants another round: run it
+    return _seed(config, values)
+
+
+def _remember_approved(values: dict, thread_id: str):
+    """Cache a human-approved draft for its intent, if its scores would pass review again."""
+    if supervisor_node({**values, "iteration_count": 1}) != "approve":
+        return
+    intent_cache.set(values["user_intent"], _drafter_model(), {
+        "current_draft": values["current_draft"],
+        "safety_score": values.get("safety_score"),
+        "empathy_score": values.get("empathy_score"),
+        "feedback_from_agents": values.get("feedback_from_agents") or {},
+        "seeded_from": thread_id,
+    })
+
+
+def _read_state(config: dict, fields: Optional[set] = None, hydrate: bool = True):
+    snapshot = get_graph().get_state(config)
+    values = snapshot.values
+    if fields is not None:
+        values = {key: value for key, value in values.items() if key in fields}
+    return snapshot._replace(values=hydrate_state(values) if hydrate else values)
+
+
+async def get_state(config: dict, fields: Optional[set] = None, hydrate: bool = True):
+    """
+    Read the latest checkpoint for a thread off the event loop, with draft history resolved.
+
+    `fields` limits the returned values to those keys (draft history is only resolved when
+    `previous_drafts` is among them); `hydrate=False` leaves draft references unresolved.
+    """
+    return await asyncio.to_thread(_read_state, config, fields, hydrate)
+
+
+def _update_state(config: dict, values: dict):
+    graph = get_graph()
+    # Edits made at the review pause are applied as the supervisor, which is the last node to
+    # have run. LangGraph infers that from the graph's runs, and a seeded thread has none,
+    # so it would route the resume back to the drafter.
+    as_node = "supervisor" if "human_review" in graph.get_state(config).next else None
+    updated = graph.update_state(config, values, as_node=as_node)
+    _index(config)
+    return updated
+
+
+async def update_state(config: dict, values: dict):
+    """Apply a state update (e.g. human edits) off the event loop."""
+    return await asyncio.to_thread(_update_state, config, values)
@@ -0,0 +1,189 @@
+"""
+Thread-affinity sharding for running several API workers.
+
+Every thread lives on exactly one shard: a worker process (`backend.app`) with its own
+checkpoint store. `backend.router` sits in front of the shards and sends each request to
+the shard owning its thread, chosen by rendezvous hashing of the thread id over the shard
+names. Adding or removing a shard only moves the threads that hash to it.
+
+    SHARDS="a=http://10.0.0.1:8000,b=http://10.0.0.2:8000"
+
+    python -m backend.sharding owner <thread_id>
+    python -m backend.sharding rebalance --db a=checkpoints-a.sqlite --db b=checkpoints-b.sqlite [--dry-run]
+
+`rebalance` moves every thread whose owner changed under SHARDS (including all threads of
+a shard no longer listed) into its owner's SQLite store: checkpoints, pending writes,
+draft history and its thread index row. Run it with the workers stopped.
+"""
+import argparse
+import hashlib
+import os
+import sqlite3
+import sys
+import uuid
+from typing import Optional
+
+from backend.config import SHARD_NAME
+
+# Shards of the deployment: comma-separated name=url pairs (a bare URL is its own name).
+# The router needs it; workers use it to refuse new threads they do not own.
+SHARDS = os.getenv("SHARDS", "")
+
+
+def parse_shards(spec: str = SHARDS) -> dict[str, str]:
+    """Shard name -> base URL, in the configured order."""
+    shards = {}
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        if "=" in item.split("://")[0]:
+            name, url = item.split("=", 1)
+        else:
+            name = url = item
+        shards[name.strip()] = url.strip().rstrip("/")
+    return shards
+
+
+def shard_for(thread_id: str, names) -> str:
+    """Owner of a thread: the shard name with the highest hash of (name, thread_id)."""
+    return max(names, key=lambda name: hashlib.blake2b(f"{name}\0{thread_id}".encode(), digest_size=8).digest())
+
+
+def owns(thread_id: str, shard: str = SHARD_NAME, spec: str = SHARDS) -> bool:
+    """Whether this worker's shard owns `thread_id` (always true when not sharded)."""
+    names = parse_shards(spec)
+    if not shard or shard not in names:
+        return True
+    return shard_for(thread_id, names) == shard
+
+
+def check_backend(backend: str, shard: str = SHARD_NAME, spec: str = SHARDS):
+    """
+    Refuse to run a sharded worker on Postgres: draft history and the thread index are kept
+    in the local SQLite CHECKPOINT_DB, so a thread served by another worker would lose them.
+    """
+    if backend == "postgres" and (shard or len(parse_shards(spec)) > 1):
+        raise RuntimeError("CHECKPOINT_BACKEND=postgres cannot be combined with SHARD_NAME/SHARDS: draft "
+                           "history and the thread index live in the local CHECKPOINT_DB; use SQLite shards")
+
+
+def new_thread_id(shard: str = SHARD_NAME, spec: str = SHARDS) -> str:
+    """A fresh thread id owned by this worker's shard, so the router can reach the thread."""
+    while True:
+        thread_id = str(uuid.uuid4())
+        if owns(thread_id, shard, spec):
+            return thread_id
+
+
+# --- Rebalancing ---
+
+def _ensure_schema(path: str):
+    """Create the checkpoint, draft store and thread index tables in a shard's store."""
+    from langgraph.checkpoint.sqlite import SqliteSaver
+    from backend.drafts import DraftStore
+    from backend.thread_index import ThreadIndex
+
+    SqliteSaver(sqlite3.connect(path, check_same_thread=False)).setup()
+    DraftStore(path)._db()
+    ThreadIndex(path)._db()
+
+
+def _draft_hashes(path: str, thread_id: str) -> set[str]:
+    """Draft blobs (and delta bases) a thread's checkpoints reference in the store at `path`."""
+    from langgraph.checkpoint.sqlite import SqliteSaver
+    from backend.drafts import DraftStore
+    from backend.maintenance import draft_hashes
+
+    saver = SqliteSaver(sqlite3.connect(path, check_same_thread=False))
+    hashes = set()
+    for checkpoint in saver.list({"configurable": {"thread_id": thread_id}}):
+        hashes.update(draft_hashes(checkpoint))
+    return DraftStore(path).with_bases(hashes)
+
+
+def move_thread(thread_id: str, source: str, target: str):
+    """
+    Copy a thread from one shard store to another, then delete it from the source.
+    Copying replaces rows, so re-running after an interruption is safe.
+    """
+    hashes = sorted(_draft_hashes(source, thread_id))
+    conn = sqlite3.connect(source)
+    conn.execute("ATTACH DATABASE ? AS target", (target,))
+    marks = ",".join("?" * len(hashes))
+    with conn:
+        for table in ("checkpoints", "writes", "threads"):
+            conn.execute(f"INSERT OR REPLACE INTO target.{table} SELECT * FROM main.{table} WHERE thread_id = ?",
+                         (thread_id,))
+        conn.execute("DELETE FROM target.threads_fts WHERE thread_id = ?", (thread_id,))
+        conn.execute(
+            "INSERT INTO target.threads_fts (thread_id, user_intent, current_draft) "
+            "SELECT thread_id, user_intent, current_draft FROM main.threads_fts WHERE thread_id = ?",
+            (thread_id,),
+        )
+        if hashes:
+            conn.execute(f"INSERT OR IGNORE INTO target.draft_blobs SELECT * FROM main.draft_blobs "
+                         f"WHERE hash IN ({marks})", hashes)
+            conn.execute(f"INSERT OR IGNORE INTO target.draft_deltas SELECT * FROM main.draft_deltas "
+                         f"WHERE hash IN ({marks})", hashes)
+    # Draft blobs stay behind (other threads may share them); gc-drafts collects them.
+    with conn:
+        for table in ("checkpoints", "writes", "threads", "threads_fts"):
+            conn.execute(f"DELETE FROM main.{table} WHERE thread_id = ?", (thread_id,))
+    conn.close()
+
+
+def rebalance(stores: dict[str, str], names, dry_run: bool = False) -> dict[tuple[str, str], int]:
+    """
+    Move every thread in `stores` (shard name -> SQLite path) to the shard owning it
+    among `names`. Returns the number of threads moved per (source, target).
+    """
+    missing = set(names) - set(stores)
+    if missing:
+        raise ValueError(f"No store given for shard(s): {', '.join(sorted(missing))}")
+
+    for path in stores.values():
+        _ensure_schema(path)
+
+    moved: dict[tuple[str, str], int] = {}
+    for source, path in stores.items():
+        thread_ids = [row[0] for row in sqlite3.connect(path).execute("SELECT DISTINCT thread_id FROM checkpoints")]
+        for thread_id in thread_ids:
+            target = shard_for(thread_id, names)
+            if target == source:
+                continue
+            if not dry_run:
+                move_thread(thread_id, path, stores[target])
+            moved[(source, target)] = moved.get((source, target), 0) + 1
+    return moved
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description="Shard ownership and rebalancing")
+    parser.add_argument("--shards", default=SHARDS, help="name=url,... (default: SHARDS)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    owner = sub.add_parser("owner")
+    owner.add_argument("thread_id")
+    move = sub.add_parser("rebalance")
+    move.add_argument("--db", action="append", default=[], metavar="NAME=PATH",
+                      help="checkpoint store of a shard; repeat for every shard, old and new")
+    move.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args(argv)
+
+    names = list(parse_shards(args.shards))
+    if not names:
+        parser.error("no shards configured (SHARDS or --shards)")
+
+    if args.command == "owner":
+        print(shard_for(args.thread_id, names))
+        return
+
+    stores = dict(item.split("=", 1) for item in args.db)
+    moved = rebalance(stores, names, args.dry_run)
+    for (source, target), count in sorted(moved.items()):
+        print(f"{source} -> {target}: {count} threads{' (dry run)' if args.dry_run else ''}")
+    print(f"{sum(moved.values())} threads {'to move' if args.dry_run else 'moved'}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,10 +12,18 @@ class ProtocolState(TypedDict):
     """
     user_intent: str  # LastWriteWins by default
     current_draft: str # LastWriteWins by default
-    previous_drafts: Annotated[List[str], operator.add] # Append
+    previous_drafts: Annotated[List[str], operator.add] # Append (draft store references, see backend/drafts.py)
     feedback_from_agents: Annotated[Dict[str, str], merge_dict] # Merge
     safety_score: float # LastWriteWins
     empathy_score: float # LastWriteWins
     iteration_count: int # LastWriteWins
     status: Literal["drafting", "reviewing", "halted", "approved"] # LastWriteWins
     human_action: Literal["approve", "revise"] # LastWriteWins
+    seeded_from: str # LastWriteWins (thread whose draft this thread reused, see backend/intents.py)
+    candidates_generated: int # LastWriteWins (speculative drafting budget, see backend/agents/speculative.py)
+    tenant: str # LastWriteWins (selects the supervisor policy, see backend/agents/supervisor.py)
+    score_history: Annotated[List[dict], operator.add] # Append (scores of each iteration, written by the supervisor)
+    tokens_used: int # LastWriteWins (LLM tokens spent on the thread)
+    elapsed_s: float # LastWriteWins (seconds the graph spent on the thread, excluding human review)
+    last_decision: dict # LastWriteWins (supervisor decision, reason and policy)
+    unscored: List[str] # LastWriteWins (score keys the short-circuit critic did not measure this round; they hold the previous value)
@@ -0,0 +1,133 @@
+import asyncio
+import threading
+import time
+from typing import Optional
+
+from backend.graph import get_graph
+from backend.drafts import hydrate_state
+
+# Nodes whose lifecycle is reported to stream subscribers.
+STREAMED_NODES = ("drafter", "safety", "empathy", "critics", "supervisor", "human_review")
+
+
+class ThreadEventBus:
+    """
+    Fan-out of graph run events to stream subscribers, keyed by thread_id.
+
+    Runs publish from executor threads; subscribers consume on their own event loop.
+    Events of the active run are buffered so a client that connects right after
+    `POST /thread?mode=job` still sees the run from its first token.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buffers: dict[str, list[dict]] = {}
+        self._subscribers: dict[str, list[tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+        self._listeners: list = []
+
+    def add_listener(self, callback):
+        """Call `callback(event)` synchronously for every event of every thread (e.g. benchmarks)."""
+        self._listeners.append(callback)
+
+    def is_active(self, thread_id: str) -> bool:
+        with self._lock:
+            return thread_id in self._buffers
+
+    def begin(self, thread_id: str):
+        with self._lock:
+            self._buffers[thread_id] = []
+        self.publish(thread_id, {"event": "run_start"})
+
+    def end(self, thread_id: str, event: dict):
+        self.publish(thread_id, event)
+        with self._lock:
+            self._buffers.pop(thread_id, None)
+
+    def publish(self, thread_id: str, event: dict):
+        event = {"thread_id": thread_id, "ts": time.time(), **event}
+        with self._lock:
+            buffer = self._buffers.get(thread_id)
+            if buffer is not None:
+                buffer.append(event)
+            subscribers = list(self._subscribers.get(thread_id, ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(queue.put_nowait, event)
+        for callback in self._listeners:
+            callback(event)
+
+    def subscribe(self, thread_id: str, require_active: bool = True) -> tuple[Optional[asyncio.Queue], list[dict]]:
+        """
+        Attach to a thread's active run.
+
+        Returns the live queue plus the events already published for the run,
+        or (None, []) when nothing is running for the thread. With
+        `require_active=False` the queue is attached anyway, to watch a run the
+        caller is about to start.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        with self._lock:
+            if require_active and thread_id not in self._buffers:
+                return None, []
+            backlog = list(self._buffers.get(thread_id, []))
+            self._subscribers.setdefault(thread_id, []).append((loop, queue))
+        return queue, backlog
+
+    def unsubscribe(self, thread_id: str, queue: asyncio.Queue):
+        with self._lock:
+            subscribers = self._subscribers.get(thread_id, [])
+            self._subscribers[thread_id] = [s for s in subscribers if s[1] is not queue]
+            if not self._subscribers[thread_id]:
+                del self._subscribers[thread_id]
+
+
+event_bus = ThreadEventBus()
+
+
+# Events after which a thread's stream is over.
+TERMINAL_EVENTS = ("run_end", "error", "cancelled")
+
+
+def stream_graph(input, config: dict, cancel_event: Optional[threading.Event] = None) -> dict:
+    """
+    Run the graph like `graph.invoke`, publishing node and token events as it goes.
+
+    Returns the final state values, exactly as `graph.invoke` would. If `cancel_event`
+    is set, the run stops at the next streamed event; the thread keeps its last
+    checkpoint and can be resumed later.
+    """
+    thread_id = config["configurable"]["thread_id"]
+    result = None
+    event_bus.begin(thread_id)
+    try:
+        for mode, chunk in get_graph().stream(input, config=config, stream_mode=["values", "tasks", "messages"]):
+            if cancel_event is not None and cancel_event.is_set():
+                event_bus.end(thread_id, {"event": "cancelled"})
+                return result
+            if mode == "values":
+                result = chunk
+            elif mode == "tasks":
+                if chunk["name"] not in STREAMED_NODES:
+                    continue
+                if "result" in chunk:
+                    event_bus.publish(thread_id, {"event": "node_end", "node": chunk["name"], "error": chunk.get("error") and str(chunk["error"])})
+                else:
+                    event_bus.publish(thread_id, {"event": "node_start", "node": chunk["name"]})
+            elif mode == "messages":
+                message, metadata = chunk
+                if message.content:
+                    event_bus.publish(thread_id, {"event": "token", "node": metadata.get("langgraph_node"), "content": message.content})
+
+        snapshot = get_graph().get_state(config)
+        if "human_review" in snapshot.next:
+            event_bus.publish(thread_id, {"event": "interrupt", "node": "human_review", "state": hydrate_state(snapshot.values)})
+        event_bus.end(thread_id, {
+            "event": "run_end",
+            "next": list(snapshot.next),
+            "status": "interrupted" if snapshot.next else "completed"
+        })
+    except BaseException as e:
+        event_bus.end(thread_id, {"event": "error", "error": str(e)})
+        raise
+
+    return result
@@ -0,0 +1,165 @@
+import re
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from backend.config import CHECKPOINT_DB
+from backend.agents.supervisor import supervisor_node
+
+# Columns returned by `ThreadIndex.search`, in order.
+COLUMNS = ("thread_id", "user_intent", "status", "interrupted", "next", "iteration_count",
+           "safety_score", "empathy_score", "created_at", "updated_at")
+
+_TOKEN = re.compile(r"\w+")
+
+
+def fts_query(text: str) -> str:
+    """Turn free text into an FTS5 query matching all words (the last one as a prefix)."""
+    terms = [f'"{token}"' for token in _TOKEN.findall(text)]
+    if terms:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+def indexed_status(values: dict, next_nodes: tuple) -> Optional[str]:
+    """
+    The status to list a thread under. The graph leaves `status` at "reviewing" when it pauses
+    for human review, so a thread the supervisor halted (rather than approved) is "halted".
+    """
+    status = values.get("status")
+    if "human_review" in next_nodes and status != "approved":
+        # Threads checkpointed before decisions were stored: decide again from their scores
+        decision = (values.get("last_decision") or {}).get("decision") or supervisor_node(values)
+        if decision == "halt":
+            return "halted"
+    return status
+
+
+class ThreadIndex:
+    """
+    Side index of threads for listing and search, so nothing has to deserialize checkpoints.
+
+    One row per thread with the fields dashboards filter on, plus an FTS5 table over
+    `user_intent` and the current draft. Rows are upserted by the runtime after every run,
+    state update and seeding; `python -m backend.maintenance reindex` rebuilds it from the
+    checkpoint store.
+    """
+
+    def __init__(self, path: str = CHECKPOINT_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.executescript(
+                """
+                PRAGMA journal_mode=WAL;
+                CREATE TABLE IF NOT EXISTS threads (
+                    thread_id TEXT PRIMARY KEY,
+                    user_intent TEXT,
+                    status TEXT,
+                    interrupted INTEGER NOT NULL DEFAULT 0,
+                    next TEXT,
+                    iteration_count INTEGER,
+                    safety_score REAL,
+                    empathy_score REAL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS threads_status ON threads (status, created_at);
+                CREATE INDEX IF NOT EXISTS threads_interrupted ON threads (interrupted, created_at);
+                CREATE INDEX IF NOT EXISTS threads_created ON threads (created_at);
+                CREATE VIRTUAL TABLE IF NOT EXISTS threads_fts USING fts5(
+                    thread_id UNINDEXED, user_intent, current_draft
+                );
+                """
+            )
+        return self._conn
+
+    def record(self, thread_id: str, values: dict, next_nodes: tuple, created_at: Optional[float] = None):
+        """Upsert a thread from its latest state (`values`, `next` as in a StateSnapshot)."""
+        now = time.time()
+        row = (
+            thread_id,
+            values.get("user_intent"),
+            indexed_status(values, next_nodes),
+            int("human_review" in next_nodes),
+            ",".join(next_nodes),
+            values.get("iteration_count"),
+            values.get("safety_score"),
+            values.get("empathy_score"),
+            created_at or now,
+            now,
+        )
+        with self._lock:
+            db = self._db()
+            db.execute(
+                """
+                INSERT INTO threads (thread_id, user_intent, status, interrupted, next, iteration_count,
+                                     safety_score, empathy_score, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (thread_id) DO UPDATE SET
+                    user_intent = excluded.user_intent, status = excluded.status,
+                    interrupted = excluded.interrupted, next = excluded.next,
+                    iteration_count = excluded.iteration_count, safety_score = excluded.safety_score,
+                    empathy_score = excluded.empathy_score, updated_at = excluded.updated_at
+                """,
+                row,
+            )
+            db.execute("DELETE FROM threads_fts WHERE thread_id = ?", (thread_id,))
+            db.execute(
+                "INSERT INTO threads_fts (thread_id, user_intent, current_draft) VALUES (?, ?, ?)",
+                (thread_id, values.get("user_intent") or "", values.get("current_draft") or ""),
+            )
+            db.commit()
+
+    def delete(self, thread_ids: list[str]):
+        with self._lock:
+            db = self._db()
+            db.executemany("DELETE FROM threads WHERE thread_id = ?", [(t,) for t in thread_ids])
+            db.executemany("DELETE FROM threads_fts WHERE thread_id = ?", [(t,) for t in thread_ids])
+            db.commit()
+
+    def search(self, status: Optional[str] = None, interrupted: Optional[bool] = None,
+               created_after: Optional[float] = None, created_before: Optional[float] = None,
+               query: Optional[str] = None, limit: int = 50, offset: int = 0) -> tuple[list[dict], int]:
+        """Filtered threads, newest first, and the total number of matches."""
+        clauses, params = [], []
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status)
+        if interrupted is not None:
+            clauses.append("interrupted = ?")
+            params.append(int(interrupted))
+        if created_after is not None:
+            clauses.append("created_at >= ?")
+            params.append(created_after)
+        if created_before is not None:
+            clauses.append("created_at < ?")
+            params.append(created_before)
+        if query and fts_query(query):
+            clauses.append("thread_id IN (SELECT thread_id FROM threads_fts WHERE threads_fts MATCH ?)")
+            params.append(fts_query(query))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        with self._lock:
+            db = self._db()
+            total = db.execute(f"SELECT COUNT(*) FROM threads {where}", params).fetchone()[0]
+            rows = db.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM threads {where} ORDER BY created_at DESC, rowid DESC LIMIT ? OFFSET ?",
+                (*params, limit, offset),
+            ).fetchall()
+
+        threads = []
+        for row in rows:
+            thread = dict(zip(COLUMNS, row))
+            thread["interrupted"] = bool(thread["interrupted"])
+            thread["next"] = thread["next"].split(",") if thread["next"] else []
+            threads.append(thread)
+        return threads, total
+
+
+thread_index = ThreadIndex()